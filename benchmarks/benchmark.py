@@ -0,0 +1,483 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+"""Benchmarks for dokuwikixmlrpc.
+
+Runs the hot paths of DokuWikiClient against a local stand-in for the
+DokuWiki XML-RPC interface and reports throughput, p50/p99 latency,
+errors, retries and the peak RSS of each benchmark. The fake server has a
+configurable latency, payload size and rates of XML-RPC faults, HTTP errors
+and timeouts. Call ::
+
+    python benchmarks/benchmark.py --help
+
+for the available options.
+"""
+
+from __future__ import print_function
+from functools import partial
+from optparse import OptionParser
+import hashlib
+import io
+import multiprocessing
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+try:
+    from SimpleXMLRPCServer import SimpleXMLRPCRequestHandler
+    from SimpleXMLRPCServer import SimpleXMLRPCServer
+    from SocketServer import ThreadingMixIn
+    import xmlrpclib
+except ImportError:
+    from socketserver import ThreadingMixIn
+    from xmlrpc.server import SimpleXMLRPCRequestHandler
+    from xmlrpc.server import SimpleXMLRPCServer
+    import xmlrpc.client as xmlrpclib
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, the peak RSS is not reported there.
+    resource = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+import dokuwikixmlrpc  # noqa: E402
+
+
+class FakeWiki(object):
+    """In-memory Wiki implementing the XML-RPC methods used by the
+    benchmarks."""
+
+    def __init__(self, pages=1000, page_size=2048, file_size=1 << 20,
+                 latency=0.0, fault_rate=0.0, http_error_rate=0.0,
+                 stall_rate=0.0, stall=2.0):
+        text = ('lorem ipsum [[start]] ' * (page_size // 22 + 1))[:page_size]
+        self.pages = dict(('ns%d:page%d' % (i % 10, i), text)
+                          for i in range(pages))
+        self.pages['start'] = text
+        self.files = {'media:file.bin': os.urandom(file_size)}
+        self.latency = latency
+        self.fault_rate = fault_rate
+        # Failures of the HTTP layer, answered by _RequestHandler.
+        self.http_error_rate = http_error_rate
+        self.stall_rate = stall_rate
+        self.stall = stall
+        # Revision of every changed item and the recent changes log, the
+        # others have the revision created.
+        self.created = self.clock = int(time.time())
+        self.revisions = {}
+        self.changes = {'pages': [], 'media': []}
+        # Page locks held by the client and by other users.
+        self.locks = set()
+        self.foreign_locks = set()
+
+    def _change(self, kind, item_id):
+        """Record a change of a page or media file."""
+        self.clock += 1
+        self.revisions[item_id] = self.clock
+        self.changes[kind].append({
+            'name': item_id, 'version': self.clock,
+            'lastModified': self._date(item_id)})
+
+    def _revision(self, item_id):
+        return self.revisions.get(item_id, self.created)
+
+    def _date(self, item_id):
+        return xmlrpclib.DateTime(time.gmtime(self._revision(item_id)))
+
+    def _changes_since(self, kind, timestamp):
+        changes = [change for change in self.changes[kind]
+                   if change['version'] >= timestamp]
+        if not changes:
+            raise xmlrpclib.Fault(321, 'There are no changes in the '
+                                  'specified timeframe')
+        return changes
+
+    def _dispatch(self, method, params):
+        """Dispatch a call, adding latency and injecting faults."""
+        if self.latency:
+            time.sleep(self.latency)
+        if method == 'system.multicall':
+            return self.multicall(*params)
+        if self.fault_rate and random.random() < self.fault_rate:
+            raise xmlrpclib.Fault(1, 'Injected fault')
+        return getattr(self, method.replace('.', '_'))(*params)
+
+    def multicall(self, calls):
+        results = []
+        for call in calls:
+            try:
+                if self.fault_rate and random.random() < self.fault_rate:
+                    raise xmlrpclib.Fault(1, 'Injected fault')
+                results.append([getattr(self, call['methodName'].replace(
+                    '.', '_'))(*call['params'])])
+            except xmlrpclib.Fault as fault:
+                results.append({'faultCode': fault.faultCode,
+                                'faultString': fault.faultString})
+        return results
+
+    def wiki_getRPCVersionSupported(self):
+        return 2
+
+    def wiki_getPage(self, page_id):
+        return self.pages.get(page_id, '')
+
+    def wiki_getPageInfo(self, page_id):
+        if page_id not in self.pages:
+            raise xmlrpclib.Fault(121, 'The requested page does not exist')
+        return {'name': page_id, 'lastModified': self._date(page_id),
+                'author': 'bench', 'version': self._revision(page_id)}
+
+    def wiki_putPage(self, page_id, text, params):
+        # Like DokuWiki, an empty text deletes the page.
+        if text:
+            self.pages[page_id] = text
+        else:
+            self.pages.pop(page_id, None)
+        self._change('pages', page_id)
+        return True
+
+    def dokuwiki_appendPage(self, page_id, text, params):
+        return self.wiki_putPage(page_id, self.pages.get(page_id, '') + text,
+                                 params)
+
+    def dokuwiki_setLocks(self, locks):
+        result = {'locked': [], 'lockfail': [], 'unlocked': [],
+                  'unlockfail': []}
+        for page_id in locks['lock']:
+            if page_id in self.foreign_locks:
+                result['lockfail'].append(page_id)
+            else:
+                self.locks.add(page_id)
+                result['locked'].append(page_id)
+        for page_id in locks['unlock']:
+            if page_id in self.locks:
+                self.locks.remove(page_id)
+                result['unlocked'].append(page_id)
+            else:
+                result['unlockfail'].append(page_id)
+        return result
+
+    def wiki_listLinks(self, page_id):
+        targets = re.findall(r'\[\[([^\]|#]+)', self.pages.get(page_id, ''))
+        return [{'type': 'local', 'page': target, 'href': '/' + target}
+                for target in sorted(set(targets))]
+
+    def wiki_getAllPages(self):
+        return [{'id': page_id, 'perms': 8, 'size': len(text),
+                 'lastModified': self._date(page_id)}
+                for page_id, text in self.pages.items()]
+
+    def dokuwiki_getPagelist(self, namespace, opts):
+        prefix = namespace.rstrip(':') + ':' if namespace else ''
+        return [{'id': page_id, 'rev': self._revision(page_id),
+                 'mtime': self._revision(page_id), 'size': len(text),
+                 'hash': hashlib.md5(text.encode('utf-8')).hexdigest()}
+                for page_id, text in self.pages.items()
+                if page_id.startswith(prefix)]
+
+    def wiki_getAttachment(self, file_id):
+        if file_id not in self.files:
+            raise xmlrpclib.Fault(221, 'The requested file does not exist')
+        return xmlrpclib.Binary(self.files[file_id])
+
+    def wiki_getAttachments(self, namespace, opts):
+        prefix = namespace + ':' if namespace else ''
+        return [{'id': file_id, 'size': len(data), 'isimg': False,
+                 'mtime': self._revision(file_id),
+                 'lastModified': self._date(file_id)}
+                for file_id, data in self.files.items()
+                if file_id.startswith(prefix) and (
+                    opts.get('recursive') or
+                    ':' not in file_id[len(prefix):])]
+
+    def wiki_putAttachment(self, file_id, data, params):
+        self.files[file_id] = data.data
+        self._change('media', file_id)
+        return file_id
+
+    def wiki_deleteAttachment(self, file_id):
+        if self.files.pop(file_id, None) is None:
+            raise xmlrpclib.Fault(221, 'The requested file does not exist')
+        self._change('media', file_id)
+        return True
+
+    def wiki_getRecentChanges(self, timestamp):
+        return self._changes_since('pages', timestamp)
+
+    def wiki_getRecentMediaChanges(self, timestamp):
+        return self._changes_since('media', timestamp)
+
+
+class _RequestHandler(SimpleXMLRPCRequestHandler):
+    rpc_paths = ('/lib/exe/xmlrpc.php',)
+    protocol_version = 'HTTP/1.1'
+
+    def is_rpc_path_valid(self):
+        # The client passes the credentials in the query string.
+        return self.path.split('?')[0] in self.rpc_paths
+
+    def do_POST(self):
+        wiki = self.server.instance
+        if wiki.http_error_rate and random.random() < wiki.http_error_rate:
+            self.rfile.read(int(self.headers['Content-Length']))
+            self.send_response(random.choice((502, 503)))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if wiki.stall_rate and random.random() < wiki.stall_rate:
+            # Longer than the client timeout, the client gives up.
+            time.sleep(wiki.stall)
+        SimpleXMLRPCRequestHandler.do_POST(self)
+
+    def do_GET(self):
+        body = b'XML-RPC server accepts POST requests only.'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(ThreadingMixIn, SimpleXMLRPCServer):
+    daemon_threads = True
+
+
+def _server(wiki, host='127.0.0.1', port=0):
+    server = _Server((host, port), _RequestHandler, logRequests=False,
+                     allow_none=True)
+    server.register_instance(wiki)
+    return server
+
+
+def serve(wiki, host='127.0.0.1', port=0):
+    """Serve wiki in a background thread, return the server."""
+    server = _server(wiki, host, port)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def _fork_context():
+    """Return a multiprocessing context forking processes, if available."""
+    try:
+        return multiprocessing.get_context('fork')
+    except (AttributeError, ValueError):
+        return None
+
+
+def serve_process(wiki, host='127.0.0.1', port=0):
+    """Serve wiki in a child process, return its (host, port).
+
+    The memory of the server then does not count towards the RSS of the
+    benchmarks. Falls back to a background thread if fork is unavailable.
+    """
+    context = _fork_context()
+    if context is None:
+        return serve(wiki, host, port).server_address
+    receiver, sender = context.Pipe(False)
+
+    def run():
+        server = _server(wiki, host, port)
+        sender.send(server.server_address)
+        server.serve_forever()
+    process = context.Process(target=run)
+    process.daemon = True
+    process.start()
+    return receiver.recv()
+
+
+def peak_rss():
+    """Return the peak RSS of the process in MiB, None if unknown."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere.
+    return rss / (1 << 20) if sys.platform == 'darwin' else rss / 1024.0
+
+
+def _percentile(latencies, fraction):
+    """Return a percentile of the sorted latencies in ms, None if there
+    are too few to tell."""
+    if len(latencies) * (1 - fraction) < 1:
+        return None
+    return latencies[int(len(latencies) * fraction)] * 1000
+
+
+def _format_ms(value):
+    """Format a latency in ms, '-' if there is none."""
+    return '%8.2f ms' % value if value is not None else '       - ms'
+
+
+def _run(setup, repeat):
+    """Run a benchmark.
+
+    Return (elapsed, latencies, errors, retries, RSS growth).
+    """
+    client, func = setup()
+    base_rss = peak_rss()
+    latencies = []
+    errors = 0
+    start = time.time()
+    for _ in range(repeat):
+        call_start = time.time()
+        try:
+            func()
+        except Exception:
+            # Includes timeouts which were not retried.
+            errors += 1
+        latencies.append(time.time() - call_start)
+    elapsed = time.time() - start
+    retries = sum(stats['retries'] for stats in client.stats().values())
+    if base_rss is None:
+        return elapsed, latencies, errors, retries, None
+    return elapsed, latencies, errors, retries, peak_rss() - base_rss
+
+
+def measure(name, setup, repeat, items=1):
+    """Run a benchmark and print the statistics.
+
+    setup is called in a child process of its own and returns the client
+    and the function to call repeat times. items is the number of items
+    processed per call, used to report the throughput in items per second.
+    The peak RSS is reported as the growth over the RSS of the child after
+    setup(), so every benchmark reports the memory used by its own calls.
+    The benchmark runs in this process if fork is unavailable, the RSS then
+    only grows from one benchmark to the next, and is not reported at all
+    without the resource module (on Windows). Retries are counted by the
+    statistics of the client.
+    """
+    context = _fork_context()
+    if context is None:
+        result = _run(setup, repeat)
+    else:
+        receiver, sender = context.Pipe(False)
+        process = context.Process(
+            target=lambda: sender.send(_run(setup, repeat)))
+        process.start()
+        sender.close()
+        result = receiver.recv()
+        process.join()
+    elapsed, latencies, errors, retries, rss = result
+    latencies.sort()
+    print('%-28s %10.1f items/s  p50 %s  p99 %s  '
+          'errors %4d  retries %4d  peak RSS %s'
+          % (name, repeat * items / elapsed,
+             _format_ms(_percentile(latencies, 0.5)),
+             _format_ms(_percentile(latencies, 0.99)),
+             errors, retries,
+             '%+7.1f MiB' % rss if rss is not None else '      - MiB'))
+
+
+def main():
+    """Run the benchmarks."""
+    parser = OptionParser()
+    parser.add_option('--pages', type='int', default=10000,
+                      help='Number of pages of the fake Wiki.')
+    parser.add_option('--page-size', type='int', default=2048,
+                      help='Size of a page in bytes.')
+    parser.add_option('--file-size', type='int', default=16 << 20,
+                      help='Size of the attachment in bytes.')
+    parser.add_option('--latency', type='float', default=0.002,
+                      help='Server latency per request in seconds.')
+    parser.add_option('--fault-rate', type='float', default=0.0,
+                      help='Probability of a fault per request.')
+    parser.add_option('--http-error-rate', type='float', default=0.0,
+                      help='Probability of an HTTP status 502 or 503 per '
+                      'request.')
+    parser.add_option('--stall-rate', type='float', default=0.0,
+                      help='Probability of a request timing out.')
+    parser.add_option('--timeout', type='float', default=1.0,
+                      help='Client timeout in seconds, requests time out '
+                      'by stalling twice as long.')
+    parser.add_option('--retry', action='store_true', default=False,
+                      help='Retry transient failures with a RetryPolicy.')
+    parser.add_option('--repeat', type='int', default=200,
+                      help='Number of repetitions of the single calls.')
+    parser.add_option('--batch-repeat', type='int', default=10,
+                      help='Number of repetitions of the batch calls and '
+                      'file transfers. p50 is only reported for at least '
+                      '2 and p99 for at least 100 repetitions.')
+    parser.add_option('--workers', type='int', default=8,
+                      help='Number of threads of the concurrent benchmarks.')
+    (options, args) = parser.parse_args()
+
+    wiki = FakeWiki(options.pages, options.page_size, options.file_size,
+                    options.latency, options.fault_rate,
+                    options.http_error_rate, options.stall_rate,
+                    2 * options.timeout)
+    url = 'http://%s:%d' % serve_process(wiki)
+    page_ids = sorted(wiki.pages)
+    batch = page_ids[:1000]
+    file_size = options.file_size
+    del wiki
+    repeat = options.repeat
+    batches = options.batch_repeat
+
+    retry = None
+    if options.retry:
+        retry = dokuwikixmlrpc.RetryPolicy(backoff=0.05, retry_writes=True)
+
+    def client():
+        return dokuwikixmlrpc.DokuWikiClient(url, 'user', 'passwd',
+                                             timeout=options.timeout,
+                                             pool_size=options.workers,
+                                             retry=retry, lazy=True)
+
+    def calling(method, *args):
+        def setup():
+            wiki_client = client()
+            return wiki_client, partial(getattr(wiki_client, method), *args)
+        return setup
+
+    def uploading(method, wrap):
+        def setup():
+            data = os.urandom(file_size)
+            wiki_client = client()
+            upload = getattr(wiki_client, method)
+            return wiki_client, lambda: upload('media:up.bin', wrap(data))
+        return setup
+
+    def download():
+        sink = open(os.devnull, 'wb')
+        wiki_client = client()
+        return wiki_client, partial(wiki_client.download_file,
+                                    'media:file.bin', sink)
+
+    def listing(method, **kwargs):
+        def setup():
+            wiki_client = client()
+            iterate = getattr(wiki_client, method)
+            return wiki_client, lambda: sum(1 for _ in iterate(**kwargs))
+        return setup
+
+    measure('page', calling('page', 'start'), repeat)
+    measure('page_info', calling('page_info', 'start'), repeat)
+    measure('pages (multicall)', calling('pages', batch), batches,
+            len(batch))
+    measure('map_pages (%d workers)' % options.workers,
+            listing('map_pages', page_ids=batch, workers=options.workers),
+            batches, len(batch))
+    measure('all_pages', calling('all_pages'), batches, len(page_ids))
+    measure('iter_all_pages (records)',
+            listing('iter_all_pages', records=True), batches,
+            len(page_ids))
+    measure('get_file', calling('get_file', 'media:file.bin'), batches)
+    measure('download_file', download, batches)
+    measure('put_file', uploading('put_file', bytes), batches)
+    measure('upload_file', uploading('upload_file', io.BytesIO), batches)
+
+
+if __name__ == '__main__':
+    main()
+
+# vim:ts=4:sw=4:tw=79:et:
@@ -1,9 +1,6 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
 
-# TODO
-# allow to overwrite useragent?
-
 """DokuWiki XMLRPC module.
 
 This modules allows to interact with the XML-RPC interface of DokuWiki
@@ -11,20 +8,68 @@ instances. It supports all methods of the DokuWiki XML-RPC interface.
 """
 
 from __future__ import print_function
+from array import array
+from collections import OrderedDict
+from collections import deque
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import partial
 from functools import wraps
+from fnmatch import fnmatch
+from itertools import chain
+import base64
+import calendar
+import csv
+import difflib
+import errno
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import random
+import re
+import shelve
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
 # Python 2 imports
 try:
+    from Queue import Empty
     from urllib import urlencode
+    from urlparse import urlsplit
     from urllib2 import urlopen
     from urllib2 import URLError
+    import httplib as http_client
     import xmlrpclib
 # Python 3 imports
 except ImportError:
+    from queue import Empty
     from urllib.parse import urlencode
+    from urllib.parse import urlsplit
     from urllib.request import urlopen
     from urllib.error import URLError
+    import http.client as http_client
     import xmlrpc.client as xmlrpclib
+from xml.parsers import expat
 from xml.parsers.expat import ExpatError
+# Optional, not available on Python 2
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+# Optional, requires the futures backport on Python 2
+try:
+    from concurrent.futures import FIRST_COMPLETED
+    from concurrent.futures import ThreadPoolExecutor
+    from concurrent.futures import wait
+except ImportError:
+    ThreadPoolExecutor = None
 
 __version__ = '2022.12.22'
 __author__ = 'Michael Klier <chi@chimeric.de>'
@@ -87,25 +132,876 @@ class DokuWikiURLError(DokuWikiError):
                                                   self.message)
 
 
+class DokuWikiConnectionError(DokuWikiError):
+    """Triggered when a request of a batch fails with a network error."""
+
+    def __init__(self, error):
+        """Initalize and call anchestor __init__()."""
+        DokuWikiError.__init__(self)
+        self.error = error
+
+    def __str__(self):
+        """Format returned error message."""
+        return '<%s: %r>' % (self.__class__.__name__, self.error)
+
+
+@contextmanager
+def xmlrpc_errors():
+    """Context manager translating xmlrpclib exceptions into DokuWikiErrors."""
+    try:
+        yield
+    except xmlrpclib.Fault as fault:
+        raise DokuWikiXMLRPCError(fault)
+    except xmlrpclib.ProtocolError as fault:
+        raise DokuWikiXMLRPCProtocolError(fault)
+    # An ExpatError is raised if xmlrpclib cannot parse the response e.g.
+    # because it is not valid XML. DokuWiki sends the plain text response
+    # "XML-RPC server not enabled" if the XML RPC interface is not enabled.
+    except ExpatError:
+        raise DokuWikiError('Failed to parse response. Is the DokuWiki XML-RPC server enabled?')
+
+
 def checkerr(f):
     """Decorator that calls the given function and catches
     :class:`xmlrpclib.Fault` exceptions."""
     @wraps(f)
     def catch_xmlerror(*args, **kwargs):
-        try:
+        with xmlrpc_errors():
             return f(*args, **kwargs)
-        except xmlrpclib.Fault as fault:
-            raise DokuWikiXMLRPCError(fault)
-        except xmlrpclib.ProtocolError as fault:
-            raise DokuWikiXMLRPCProtocolError(fault)
-        # An ExpatError is raised if xmlrpclib cannot parse the response e.g.
-        # because it is not valid XML. DokuWiki sends the plain text response
-        # "XML-RPC server not enabled" if the XML RPC interface is not enabled.
-        except ExpatError:
-            raise DokuWikiError('Failed to parse response. Is the DokuWiki XML-RPC server enabled?')
     return catch_xmlerror
 
 
+def _call_catching(func, item):
+    """Return func(item) or the DokuWikiError raised by it.
+
+    Network errors are returned wrapped in a DokuWikiConnectionError.
+    """
+    try:
+        return func(item)
+    except DokuWikiError as error:
+        return error
+    except (socket.error, http_client.HTTPException) as error:
+        return DokuWikiConnectionError(error)
+
+
+def _next_done(pending, ordered):
+    """Pop the next finished (item, future) pair from pending."""
+    if not ordered:
+        wait([future for item, future in pending],
+             return_when=FIRST_COMPLETED)
+        for entry in pending:
+            if entry[1].done():
+                pending.remove(entry)
+                return entry[0], entry[1].result()
+    item, future = pending.popleft()
+    return item, future.result()
+
+
+def _parallel_map(func, items, workers, ordered=True):
+    """Yield (item, func(item)) pairs computed on a pool of worker threads.
+
+    A DokuWikiError or network error raised by func is yielded as result
+    instead of being raised (see _call_catching()). Results are yielded in
+    input order if ordered is True, otherwise in completion order. At most
+    twice as many items as there are workers are queued at once, so items may
+    be a lazy iterable. Runs serially if concurrent.futures is not available.
+    """
+    if ThreadPoolExecutor is None or workers < 2:
+        for item in items:
+            yield item, _call_catching(func, item)
+        return
+    executor = ThreadPoolExecutor(workers)
+    pending = deque()
+    try:
+        for item in items:
+            pending.append((item, executor.submit(_call_catching, func, item)))
+            if len(pending) >= 2 * workers:
+                yield _next_done(pending, ordered)
+        while pending:
+            yield _next_done(pending, ordered)
+    finally:
+        for item, future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def _method_name(request_body):
+    """Return the XML-RPC method name of a request body."""
+    start = request_body.find(b'<methodName>')
+    end = request_body.find(b'</methodName>', start)
+    if start < 0 or end < 0:
+        return 'unknown'
+    return request_body[start + len(b'<methodName>'):end].decode('utf-8')
+
+
+class _CountingResponse(object):
+    """HTTP response wrapper counting the bytes read."""
+
+    def __init__(self, response):
+        self._response = response
+        self.size = 0
+
+    def read(self, amt=None):
+        data = self._response.read(amt)
+        self.size += len(data)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+
+class _GzipDecodedResponse(object):
+    """HTTP response wrapper decompressing a gzip encoded body while it is
+    read."""
+
+    def __init__(self, response):
+        self._response = response
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def _flush(self):
+        """Return the rest of the decompressed data at the end of the body."""
+        decompressor, self._decompressor = self._decompressor, None
+        return decompressor.flush() if decompressor else b''
+
+    def read(self, amt=None):
+        decompressor = self._decompressor
+        if decompressor is None:
+            return b''
+        if amt is None:
+            return b''.join([
+                decompressor.decompress(decompressor.unconsumed_tail),
+                decompressor.decompress(self._response.read()),
+                self._flush()])
+        while True:
+            # Input beyond amt bytes of output is kept by the decompressor
+            # as unconsumed_tail, so nothing is decompressed ahead.
+            chunk = decompressor.unconsumed_tail
+            if not chunk:
+                chunk = self._response.read(65536)
+                if not chunk:
+                    return self._flush()
+            data = decompressor.decompress(chunk, amt)
+            if data:
+                return data
+
+    def getheader(self, name, default=None):
+        # The body is already decoded, hide the encoding from xmlrpclib.
+        if name.lower() == 'content-encoding':
+            return default
+        return self._response.getheader(name, default)
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+
+class DokuWikiStats(object):
+    """Per-method request statistics collected by DokuWikiTransport.
+
+    Latencies are counted in a histogram whose buckets have the upper bounds
+    in BUCKETS (seconds).
+    """
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+               float('inf'))
+
+    def __init__(self):
+        """Initialize empty statistics."""
+        self._lock = threading.Lock()
+        self._methods = {}
+
+    def _method(self, method):
+        """Return the statistics of a method, creating them if needed."""
+        stats = self._methods.get(method)
+        if stats is None:
+            stats = self._methods[method] = {
+                'calls': 0, 'faults': 0, 'errors': 0, 'retries': 0,
+                'request_bytes': 0, 'response_bytes': 0, 'time': 0.0,
+                'histogram': [0] * len(self.BUCKETS)}
+        return stats
+
+    def record(self, event):
+        """Record a finished request (see DokuWikiTransport.add_hook())."""
+        with self._lock:
+            stats = self._method(event['method'])
+            stats['calls'] += 1
+            if isinstance(event['error'], xmlrpclib.Fault):
+                stats['faults'] += 1
+            elif event['error'] is not None:
+                stats['errors'] += 1
+            stats['request_bytes'] += event['request_bytes']
+            stats['response_bytes'] += event['response_bytes']
+            stats['time'] += event['elapsed']
+            for index, bound in enumerate(self.BUCKETS):
+                if event['elapsed'] <= bound:
+                    stats['histogram'][index] += 1
+                    break
+
+    def record_retry(self, method):
+        """Record that a request for method is retried."""
+        with self._lock:
+            self._method(method)['retries'] += 1
+
+    def snapshot(self):
+        """Return a copy of the statistics as a dict per method.
+
+        The histogram is returned as a list of (upper bound, count) pairs.
+        """
+        with self._lock:
+            snapshot = {}
+            for method, stats in self._methods.items():
+                snapshot[method] = dict(stats)
+                snapshot[method]['histogram'] = list(zip(self.BUCKETS,
+                                                         stats['histogram']))
+            return snapshot
+
+    def reset(self):
+        """Drop all statistics."""
+        with self._lock:
+            self._methods.clear()
+
+
+# XML-RPC methods which modify the remote Wiki
+WRITE_METHODS = frozenset([
+    'wiki.putPage', 'dokuwiki.appendPage', 'wiki.putAttachment',
+    'wiki.deleteAttachment', 'dokuwiki.setLocks', 'plugin.struct.saveData',
+])
+
+
+def _is_write(method, request_body):
+    """Check whether a request may modify the remote Wiki."""
+    if method == 'system.multicall':
+        return any(name.encode('ascii') in request_body
+                   for name in WRITE_METHODS)
+    return method in WRITE_METHODS
+
+
+def _is_stale(error):
+    """Check whether error means the server closed a pooled connection."""
+    if isinstance(error, http_client.BadStatusLine):
+        return True
+    return isinstance(error, socket.error) and error.errno in (
+        errno.ECONNRESET, errno.ECONNABORTED, errno.EPIPE)
+
+
+class RetryPolicy(object):
+    """Retry policy for transient request failures.
+
+    A request is retried up to max_retries times if the server answers with
+    one of the HTTP statuses or the connection fails or times out. Before
+    the n-th retry the transport waits up to backoff * 2 ** n seconds, at most
+    max_backoff seconds, randomized with full jitter unless jitter is False.
+    Requests which may modify the Wiki are only retried if retry_writes is
+    True, since a write that timed out may still have been applied.
+
+    The policy applies to every call of DokuWikiClient. The streaming methods
+    (download_file(), upload_file() and the iter_*() listings) are retried
+    only while no part of the response was consumed yet: a failure after the
+    first bytes were written to the file or the first items were yielded is
+    raised.
+    """
+
+    def __init__(self, max_retries=3, backoff=0.5, max_backoff=30,
+                 statuses=(429, 502, 503, 504), retry_writes=False,
+                 jitter=True):
+        """Create a retry policy."""
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = statuses
+        self.retry_writes = retry_writes
+        self.jitter = jitter
+
+    def should_retry(self, error, attempt, write=False):
+        """Check whether a request failing with error should be retried."""
+        if attempt >= self.max_retries or (write and not self.retry_writes):
+            return False
+        if isinstance(error, xmlrpclib.ProtocolError):
+            return error.errcode in self.statuses
+        return isinstance(error, (socket.error, http_client.HTTPException))
+
+    def delay(self, attempt):
+        """Return the number of seconds to wait before retry attempt."""
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+        return random.uniform(0, delay) if self.jitter else delay
+
+
+class RateLimiter(object):
+    """Thread-safe token bucket limiting the request rate.
+
+    Allows rate requests per second on average with bursts of up to burst
+    requests. One limiter can be shared by several clients.
+    """
+
+    def __init__(self, rate, burst=None):
+        """Create a rate limiter."""
+        self._rate = float(rate)
+        self._burst = float(burst or max(1, rate))
+        self._tokens = self._burst
+        self._last = time.time()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, waiting until one is available."""
+        with self._lock:
+            now = time.time()
+            self._tokens = min(self._burst,
+                               self._tokens + (now - self._last) * self._rate)
+            self._last = now
+            # Reserve the token now, tokens may go negative, so waiting
+            # callers are served in order.
+            self._tokens -= 1
+            wait = -self._tokens / self._rate
+        if wait > 0:
+            time.sleep(wait)
+
+
+class DokuWikiTransport(xmlrpclib.Transport):
+    """XML-RPC transport keeping a pool of persistent HTTP/1.1 connections.
+
+    Connections are reused across calls and threads, so a client only pays for
+    the TCP and TLS handshakes once per pooled connection. At most pool_size
+    idle connections are kept per host and connections which have been idle
+    for more than idle_timeout seconds are closed instead of being reused.
+    The timeout and the SSL context are applied to every connection.
+
+    Requests failing with a transient error are retried according to the
+    optional RetryPolicy retry, streamed requests (see open_stream()) only
+    until their response is handed to the caller. All requests are
+    throttled by the optional RateLimiter rate_limit.
+
+    The user_agent and the additional (name, value) headers, e.g. for
+    authentication, are sent with every request. All settings belong to the
+    transport instance, so transports with different settings can be used
+    side by side and one transport can be shared by many threads.
+
+    If accept_gzip is True, the server may gzip its responses. Request bodies
+    of at least gzip_threshold bytes are sent gzip compressed, which the
+    web server has to support (e.g. the DEFLATE input filter of Apache
+    mod_deflate), so this is disabled by default.
+    """
+
+    def __init__(self, use_https=False, timeout=None, context=None,
+                 pool_size=10, idle_timeout=30, retry=None, rate_limit=None,
+                 user_agent=None, headers=(), accept_gzip=True,
+                 gzip_threshold=None):
+        """Initalize and call anchestor __init__()."""
+        xmlrpclib.Transport.__init__(self)
+        self.verbose = False
+        if user_agent is not None:
+            self.user_agent = user_agent
+        self._request_headers = list(headers)
+        self._accept_gzip = accept_gzip
+        self._gzip_threshold = gzip_threshold
+        self._use_https = use_https
+        self._timeout = timeout
+        self._context = context
+        self._pool_size = pool_size
+        self._idle_timeout = idle_timeout
+        self._retry = retry
+        self._rate_limit = rate_limit
+        self._pool = {}
+        self._pool_lock = threading.Lock()
+        self._pre_hooks = []
+        self._post_hooks = []
+        self.stats = DokuWikiStats()
+
+    def add_hook(self, pre=None, post=None):
+        """Register callbacks called before and after every request.
+
+        Both are called with a dict describing the request: the XML-RPC
+        'method' and the 'request_bytes'. When the request is done, the dict
+        also holds the 'response_bytes', the 'elapsed' time in seconds and
+        the exception in 'error' (None if the request succeeded).
+        """
+        if pre is not None:
+            self._pre_hooks.append(pre)
+        if post is not None:
+            self._post_hooks.append(post)
+
+    def _acquire(self, chost):
+        """Return an idle pooled connection to chost or open a new one."""
+        with self._pool_lock:
+            idle = self._pool.get(chost, [])
+            while idle:
+                conn, last_used = idle.pop()
+                if time.time() - last_used < self._idle_timeout:
+                    return conn
+                # The most recently used connection is stale, so are the rest.
+                conn.close()
+                while idle:
+                    idle.pop()[0].close()
+        if self._use_https:
+            return http_client.HTTPSConnection(chost, timeout=self._timeout,
+                                               context=self._context)
+        return http_client.HTTPConnection(chost, timeout=self._timeout)
+
+    def _release(self, chost, conn):
+        """Return a connection to the pool or close it if the pool is full."""
+        with self._pool_lock:
+            idle = self._pool.setdefault(chost, [])
+            if len(idle) < self._pool_size:
+                idle.append((conn, time.time()))
+                return
+        conn.close()
+
+    @contextmanager
+    def open_response(self, host, handler, request_body, verbose=False,
+                      content_length=None):
+        """Send a POST request over a pooled connection and yield the response.
+
+        If content_length is given, request_body is an iterable of byte
+        chunks which are sent one after the other instead of a byte string;
+        such streamed bodies are never compressed. The connection goes back to
+        the pool on exit if the response has been read completely, otherwise
+        it is closed. A ProtocolError is raised if the server does not answer
+        with HTTP status 200. A gzip encoded response is decompressed while
+        it is read.
+        """
+        content_encoding = None
+        if content_length is None:
+            method = _method_name(request_body)
+            if (self._gzip_threshold is not None and
+                    len(request_body) >= self._gzip_threshold):
+                compressor = zlib.compressobj(6, zlib.DEFLATED,
+                                              16 + zlib.MAX_WBITS)
+                request_body = (compressor.compress(request_body) +
+                                compressor.flush())
+                content_encoding = 'gzip'
+            content_length = len(request_body)
+            chunks = iter([request_body])
+        else:
+            chunks = iter(request_body)
+            first = next(chunks, b'')
+            method = _method_name(first)
+            chunks = chain([first], chunks)
+        event = {'method': method, 'request_bytes': content_length}
+        for hook in self._pre_hooks:
+            hook(event)
+        if self._rate_limit is not None:
+            self._rate_limit.acquire()
+        start = time.time()
+        chost, extra_headers, x509 = self.get_host_info(host)
+        conn = self._acquire(chost)
+        response = counter = None
+        try:
+            if verbose:
+                conn.set_debuglevel(1)
+            conn.putrequest('POST', handler, skip_accept_encoding=True)
+            conn.putheader('Content-Type', 'text/xml')
+            conn.putheader('User-Agent', self.user_agent)
+            conn.putheader('Content-Length', str(content_length))
+            if content_encoding is not None:
+                conn.putheader('Content-Encoding', content_encoding)
+            if self._accept_gzip:
+                conn.putheader('Accept-Encoding', 'gzip')
+            headers = self._request_headers + list(extra_headers or [])
+            for key, value in headers:
+                conn.putheader(key, value)
+            conn.endheaders()
+            for chunk in chunks:
+                conn.send(chunk)
+            response = conn.getresponse()
+            if response.status != 200:
+                response.read()
+                # The server may not have read the request body.
+                response.will_close = True
+                raise xmlrpclib.ProtocolError(host + handler, response.status,
+                                              response.reason, response.msg)
+            counter = _CountingResponse(response)
+            if response.getheader('Content-Encoding', '') == 'gzip':
+                yield _GzipDecodedResponse(counter)
+            else:
+                yield counter
+        except Exception as error:
+            event['error'] = error
+            raise
+        finally:
+            if (response is not None and response.isclosed() and
+                    not response.will_close):
+                self._release(chost, conn)
+            else:
+                conn.close()
+            event.setdefault('error', None)
+            event['elapsed'] = time.time() - start
+            event['response_bytes'] = counter.size if counter else 0
+            self.stats.record(event)
+            for hook in self._post_hooks:
+                hook(event)
+
+    @contextmanager
+    def open_stream(self, host, handler, request_body, content_length=None):
+        """Like open_response(), but retry until the response is yielded.
+
+        A request failing before the response is yielded is retried like
+        request() does: once if a pooled connection went stale and according
+        to the retry policy, e.g. on an HTTP status 503 or a timeout while
+        waiting for the response. Nothing is retried once the response has
+        been yielded, since the caller may have consumed part of it. If
+        content_length is given, request_body is a function returning a new
+        iterable of body chunks per attempt.
+        """
+        retried = False
+        attempt = 0
+        while True:
+            if content_length is None:
+                body = head = request_body
+            else:
+                chunks = iter(request_body())
+                head = next(chunks, b'')
+                body = chain([head], chunks)
+            method = _method_name(head)
+            context = self.open_response(host, handler, body, self.verbose,
+                                         content_length)
+            try:
+                response = context.__enter__()
+                break
+            except Exception as error:
+                if not retried and _is_stale(error):
+                    retried = True
+                elif self._should_retry(error, attempt,
+                                        _is_write(method, head)):
+                    time.sleep(self._retry.delay(attempt))
+                    attempt += 1
+                else:
+                    raise
+            self.stats.record_retry(method)
+        try:
+            yield response
+        except BaseException:
+            if not context.__exit__(*sys.exc_info()):
+                raise
+        else:
+            context.__exit__(None, None, None)
+
+    def request(self, host, handler, request_body, verbose=False):
+        """Send a request, retrying according to the retry policy."""
+        method = _method_name(request_body)
+        attempt = 0
+        while True:
+            try:
+                return self._request(host, handler, request_body, verbose)
+            except Exception as error:
+                if not self._should_retry(error, attempt,
+                                          _is_write(method, request_body)):
+                    raise
+            self.stats.record_retry(method)
+            time.sleep(self._retry.delay(attempt))
+            attempt += 1
+
+    def _should_retry(self, error, attempt, write):
+        """Check whether the retry policy allows to retry a request."""
+        return self._retry is not None and self._retry.should_retry(
+            error, attempt, write)
+
+    def _request(self, host, handler, request_body, verbose=False):
+        """Send a request, retrying once if a pooled connection went stale."""
+        try:
+            return self.single_request(host, handler, request_body, verbose)
+        except Exception as error:
+            if not _is_stale(error):
+                raise
+        self.stats.record_retry(_method_name(request_body))
+        return self.single_request(host, handler, request_body, verbose)
+
+    def single_request(self, host, handler, request_body, verbose=False):
+        """Send a request and parse the response."""
+        with self.open_response(host, handler, request_body,
+                                verbose) as response:
+            self.verbose = verbose
+            return self.parse_response(response)
+
+    def close(self):
+        """Close all pooled connections."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, {}
+        for idle in pool.values():
+            for conn, last_used in idle:
+                conn.close()
+
+
+class _Base64Writer(object):
+    """Decode the base64 value of an XML-RPC response while it is read.
+
+    The decoded data is written to target, which is either a file-like object
+    or a writable buffer such as a bytearray or memoryview. Faults and any
+    other unexpected response are reported as for regular calls.
+    """
+
+    def __init__(self, target):
+        """Initialize the writer for target."""
+        if hasattr(target, 'write'):
+            self._write = target.write
+        else:
+            self._view = memoryview(target)
+            self._write = self._write_view
+        self.size = 0
+        self._pending = bytearray()
+        self._in_base64 = False
+        self._found = False
+        self._head = []
+        self._parser = expat.ParserCreate()
+        self._parser.StartElementHandler = self._start
+        self._parser.EndElementHandler = self._end
+        self._parser.CharacterDataHandler = self._data
+
+    def _write_view(self, data):
+        """Copy data into the target buffer."""
+        self._view[self.size:self.size + len(data)] = data
+
+    def _start(self, tag, attrs):
+        if tag == 'base64' and not self._found:
+            self._in_base64 = self._found = True
+
+    def _end(self, tag):
+        if tag == 'base64' and self._in_base64:
+            self._in_base64 = False
+            self._flush(final=True)
+
+    def _data(self, data):
+        if self._in_base64:
+            self._pending.extend(b''.join(data.encode('ascii').split()))
+            if len(self._pending) >= 65536:
+                self._flush()
+
+    def _flush(self, final=False):
+        """Decode and write all complete base64 quadruples."""
+        usable = len(self._pending) if final else len(self._pending) // 4 * 4
+        data = base64.b64decode(bytes(self._pending[:usable]))
+        del self._pending[:usable]
+        self._write(data)
+        self.size += len(data)
+
+    def feed(self, response, chunk_size=65536):
+        """Read and decode the whole response, return the size written."""
+        while True:
+            chunk = response.read(chunk_size)
+            if not chunk:
+                break
+            if not self._found:
+                # Keep the response until the data starts to report faults.
+                self._head.append(chunk)
+            self._parser.Parse(chunk, False)
+        self._parser.Parse(b'', True)
+        if not self._found:
+            xmlrpclib.loads(b''.join(self._head))
+            raise DokuWikiError('Unexpected response, expected binary data.')
+        return self.size
+
+
+def _iter_base64(source, size, chunk_size=3 * 16384):
+    """Yield the first size bytes of source base64 encoded in chunks.
+
+    source is either a file-like object or a buffer such as a bytes object
+    or memoryview. chunk_size must be a multiple of 3 so the encoded chunks
+    can simply be concatenated.
+    """
+    view = None if hasattr(source, 'read') else memoryview(source)
+    offset = 0
+    while offset < size:
+        length = min(chunk_size, size - offset)
+        if view is None:
+            data = source.read(length)
+        else:
+            data = view[offset:offset + length].tobytes()
+        if not data:
+            raise DokuWikiError('Source ended after %d of %d bytes.'
+                                % (offset, size))
+        # A short read is only fine at the end of the data.
+        while len(data) < length:
+            more = source.read(length - len(data))
+            if not more:
+                raise DokuWikiError('Source ended after %d of %d bytes.'
+                                    % (offset + len(data), size))
+            data += more
+        offset += length
+        yield base64.b64encode(data)
+
+
+PageEntry = namedtuple('PageEntry',
+                       'id rev mtime size hash perms lastModified')
+PageEntry.__doc__ = """Compact record of a page listing entry."""
+
+ChangeEntry = namedtuple('ChangeEntry',
+                         'name lastModified author version perms size')
+ChangeEntry.__doc__ = """Compact record of a recent changes entry."""
+
+
+WalkEntry = namedtuple('WalkEntry', 'namespace namespaces pages media cursor')
+WalkEntry.__doc__ = """Namespace visited by DokuWikiClient.walk()."""
+
+
+def _record(record_type):
+    """Return a function converting a struct into a record_type record."""
+    def convert(item):
+        return record_type(*[item.get(field) for field in record_type._fields])
+    return convert
+
+
+_NOTHING = object()
+
+_CONVERTERS = {
+    'string': lambda text: text,
+    'int': int,
+    'i4': int,
+    'i8': int,
+    'boolean': lambda text: text.strip() == '1',
+    'double': float,
+    'dateTime.iso8601': lambda text: xmlrpclib.DateTime(text.strip()),
+    'base64': lambda text: xmlrpclib.Binary(
+        base64.b64decode(text.encode('ascii'))),
+    'nil': lambda text: None,
+}
+
+
+class _ListParser(object):
+    """Incrementally parse an XML-RPC response returning an array.
+
+    The items of the array are appended to the items queue as soon as they
+    are complete and converted by the optional convert function, so the
+    caller can consume them while the response is still being read and the
+    array is never built as a whole.
+    """
+
+    def __init__(self, convert=None):
+        """Initialize the parser."""
+        self.items = deque()
+        self._convert = convert
+        self._stack = []
+        self._names = []
+        self._text = []
+        self._value = _NOTHING
+        self._result = None
+        self._fault = False
+        self._parser = expat.ParserCreate()
+        self._parser.buffer_text = True
+        self._parser.StartElementHandler = self._start
+        self._parser.EndElementHandler = self._end
+        self._parser.CharacterDataHandler = self._text.append
+
+    def _start(self, tag, attrs):
+        if tag == 'struct':
+            self._stack.append({})
+        elif tag == 'array':
+            self._stack.append([])
+        elif tag == 'fault':
+            self._fault = True
+        del self._text[:]
+
+    def _end(self, tag):
+        text = ''.join(self._text)
+        del self._text[:]
+        if tag == 'name':
+            self._names.append(text)
+        elif tag in _CONVERTERS:
+            self._value = _CONVERTERS[tag](text)
+        elif tag in ('struct', 'array'):
+            self._value = self._stack.pop()
+        elif tag == 'value':
+            value = text if self._value is _NOTHING else self._value
+            self._value = _NOTHING
+            self._add(value)
+
+    def _add(self, value):
+        """Add a complete value to its container."""
+        if not self._stack:
+            self._result = value
+        elif isinstance(self._stack[-1], dict):
+            self._stack[-1][self._names.pop()] = value
+        elif len(self._stack) == 1 and not self._fault:
+            self.items.append(self._convert(value) if self._convert else value)
+        else:
+            self._stack[-1].append(value)
+
+    def feed(self, data):
+        """Parse the next chunk of the response, an empty chunk ends it."""
+        self._parser.Parse(data, not data)
+        if not data and self._fault:
+            raise xmlrpclib.Fault(self._result.get('faultCode', 0),
+                                  self._result.get('faultString', ''))
+
+
+class DokuWikiCache(object):
+    """Response cache for DokuWikiClient.
+
+    Entries are kept in an in-memory LRU of at most maxsize entries. Entries
+    for an explicit page revision are immutable and never expire. If path is
+    given, they are also stored in a shelve database on disk, so they survive
+    the process. Entries for the current revision of a page expire after ttl
+    seconds, after which the client revalidates them against the
+    lastModified date reported by page_info().
+
+    Keys are tuples (url, user, method, page_id, ...), so a cache can be
+    shared by the clients of several Wikis and users.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60, path=None):
+        """Create a response cache."""
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = shelve.open(path) if path else None
+
+    def get(self, key):
+        """Return the (value, tag, expires) entry for key or None.
+
+        expires is None for immutable entries.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None and self._disk is not None:
+                entry = self._disk.get(repr(key))
+            if entry is not None:
+                self._insert(key, entry)
+            return entry
+
+    def set(self, key, value, tag=None, immutable=False):
+        """Store value for key.
+
+        tag identifies the page version value belongs to. Immutable entries
+        are also written to the disk tier.
+        """
+        entry = (value, tag, None if immutable else time.time() + self._ttl)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._insert(key, entry)
+            if immutable and self._disk is not None:
+                self._disk[repr(key)] = entry
+
+    def _insert(self, key, entry):
+        """Insert an entry as most recently used, evicting the LRU ones."""
+        self._entries[key] = entry
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, url, page_id):
+        """Drop all mutable entries of a page of the Wiki at url."""
+        with self._lock:
+            for key in [key for key, entry in self._entries.items()
+                        if key[0] == url and key[3] == page_id and
+                        entry[2] is not None]:
+                del self._entries[key]
+
+    def clear(self):
+        """Drop all in-memory entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def close(self):
+        """Close the disk tier."""
+        if self._disk is not None:
+            self._disk.close()
+
+
+# Results of DokuWikiClient.ping() per URL
+_PING_CACHE = {}
+
+
+def _info_tag(info):
+    """Return a tag identifying the page version described by page_info()."""
+    return '%s/%s' % (info.get('lastModified'), info.get('version'))
+
+
 class DokuWikiClient(object):
     """DokuWiki XML-RPC client.
 
@@ -116,12 +1012,38 @@ class DokuWikiClient(object):
     """
 
     def __init__(self, url, user, passwd, http_basic_auth=False, timeout=10,
-                 context=None):
+                 context=None, chunk_size=50, pool_size=10, cache=None,
+                 lazy=False, retry=None, rate_limit=None, user_agent=None,
+                 gzip_requests=False, gzip_threshold=65536, accept_gzip=True):
         """Create DokuWiki XMLRPC client.
 
         Try to get a XML-RPC object. If this step fails a DokuWIKIXMLRPCError
         is raised. If the supplied URL is not reachable we raise a
         DokuWikiURLError. Use these to catch bad user input.
+
+        If lazy is True, the URL is not checked when the client is created,
+        but by calling ping() before the first real call.
+
+        retry is an optional RetryPolicy for transient errors and rate_limit
+        an optional RateLimiter throttling all requests of the client.
+
+        Every client has its own transport carrying its User-Agent (which can
+        be overridden with user_agent), credentials, timeout and SSL context,
+        so clients for different Wikis do not interfere with each other.
+
+        Responses are requested gzip compressed unless accept_gzip is False,
+        e.g. when the web server spends more time on compression than the
+        transfer saves. If gzip_requests is True, request bodies of at least
+        gzip_threshold bytes (e.g. put_page() and put_file() of large data)
+        are sent gzip compressed as well. This needs support by the web
+        server (see DokuWikiTransport).
+
+        chunk_size is the default number of calls packed into a single
+        system.multicall request by the batch methods (see multicall()).
+        pool_size is the number of idle keep-alive connections kept open to
+        the remote Wiki (see DokuWikiTransport).
+        cache is an optional DokuWikiCache used by page(), page_info(),
+        page_html() and page_versions().
         """
 
         self._url = url
@@ -130,34 +1052,142 @@ class DokuWikiClient(object):
         self._http_basic_auth = http_basic_auth
         self._timeout = timeout
         self._context = context
-        self._user_agent = ' '.join(['DokuWikiXMLRPC ',
-                                     __version__,
-                                     '(https://github.com/kynan/dokuwikixmlrpc)'])
-
-        self._xmlrpc = self._xmlrpc_init()
+        self._chunk_size = chunk_size
+        self._pool_size = pool_size
+        self._cache = cache
+        self._lazy = lazy
+        self._retry = retry
+        self._rate_limit = rate_limit
+        self._gzip_threshold = gzip_threshold if gzip_requests else None
+        self._accept_gzip = accept_gzip
+        self._validated = not lazy
+        self._struct_schemas = {}
+        self._user_agent = user_agent or ' '.join([
+            'DokuWikiXMLRPC ', __version__,
+            '(https://github.com/kynan/dokuwikixmlrpc)'])
+
+        self._local = threading.local()
+        self._xmlrpc_init()
 
     @checkerr
     def _xmlrpc_init(self):
         """Initialize the XMLRPC object."""
         script = '/lib/exe/xmlrpc.php'
 
-        try:
-            urlopen(self._url + script, timeout=self._timeout)
-        except (ValueError, URLError):
-            raise DokuWikiURLError(self._url)
+        if not self._lazy:
+            try:
+                urlopen(self._url + script, timeout=self._timeout)
+            except (ValueError, URLError):
+                raise DokuWikiURLError(self._url)
 
+        headers = []
         if self._http_basic_auth:
-            proto, url = self._url.split('://')
-            url = ''.join([proto, '://', self._user, ':', self._passwd, '@',
-                           url, script])
+            credentials = '%s:%s' % (self._user, self._passwd)
+            credentials = base64.b64encode(credentials.encode('utf-8'))
+            headers.append(('Authorization',
+                            'Basic ' + credentials.decode('ascii')))
+            url = self._url + script
         else:
             url = ''.join([self._url, script, '?',
                            urlencode({'u': self._user, 'p': self._passwd})])
 
-        xmlrpclib.Transport.user_agent = self._user_agent
-        xmlrpclib.SafeTransport.user_agent = self._user_agent
+        self._xmlrpc_url = url
+        self._transport = DokuWikiTransport(
+            url.startswith('https://'), timeout=self._timeout,
+            context=self._context, pool_size=self._pool_size,
+            retry=self._retry, rate_limit=self._rate_limit,
+            user_agent=self._user_agent, headers=headers,
+            gzip_threshold=self._gzip_threshold,
+            accept_gzip=self._accept_gzip)
+
+    def _endpoint(self):
+        """Return the (host, handler) of the XML-RPC endpoint."""
+        if not self._validated:
+            self.ping()
+        parts = urlsplit(self._xmlrpc_url)
+        handler = parts.path
+        if parts.query:
+            handler += '?' + parts.query
+        return parts.netloc, handler
+
+    @property
+    def _xmlrpc(self):
+        """The XMLRPC object of the current thread.
 
-        return xmlrpclib.ServerProxy(url, context=self._context)
+        xmlrpclib.ServerProxy is not thread-safe, so every thread gets its own
+        proxy. All proxies share the connection pool of the client.
+        """
+        if not self._validated:
+            self.ping()
+        proxy = getattr(self._local, 'proxy', None)
+        if proxy is None:
+            proxy = xmlrpclib.ServerProxy(self._xmlrpc_url,
+                                          transport=self._transport)
+            self._local.proxy = proxy
+        return proxy
+
+    def close(self):
+        """Close the pooled connections to the remote Wiki."""
+        self._transport.close()
+
+    def stats(self):
+        """Return a snapshot of the request statistics per XML-RPC method.
+
+        For every method the number of 'calls', 'faults', other 'errors' and
+        'retries', the 'request_bytes' and 'response_bytes', the total 'time'
+        in seconds and a latency 'histogram' are reported (see
+        DokuWikiStats).
+        """
+        return self._transport.stats.snapshot()
+
+    def add_request_hook(self, pre=None, post=None):
+        """Register callbacks called before and after every request.
+
+        See DokuWikiTransport.add_hook() for the arguments of the callbacks.
+        """
+        self._transport.add_hook(pre, post)
+
+    def _cached(self, immutable, method, *args):
+        """Call an XML-RPC method about a page through the response cache.
+
+        The first argument must be the page id. Mutable entries are tagged
+        with the page's lastModified date, fetched in the same multicall, and
+        only refetched if that date changed once the entry expired.
+        """
+        if self._cache is None:
+            return getattr(self._xmlrpc, method)(*args)
+        # Other Wikis and users (with other ACLs) may share the cache.
+        key = (self._url, self._user, method) + args
+        entry = self._cache.get(key)
+        if entry is not None:
+            value, tag, expires = entry
+            if expires is None or expires > time.time():
+                return value
+            if tag is not None and tag == self._page_tag(args[0]):
+                self._cache.set(key, value, tag)
+                return value
+        if immutable:
+            value = getattr(self._xmlrpc, method)(*args)
+            self._cache.set(key, value, immutable=True)
+            return value
+        if method == 'wiki.getPageInfo':
+            value = self._xmlrpc.wiki.getPageInfo(*args)
+            info = value
+        else:
+            value, info = self.multicall([(method, args),
+                                          ('wiki.getPageInfo', args[:1])])
+            if isinstance(value, DokuWikiError):
+                raise value
+        tag = None if isinstance(info, DokuWikiError) else _info_tag(info)
+        self._cache.set(key, value, tag)
+        return value
+
+    def _page_tag(self, page_id):
+        """Return the tag of the current version of a page or None."""
+        try:
+            return _info_tag(self._xmlrpc.wiki.getPageInfo(page_id))
+        except xmlrpclib.Fault:
+            return None
 
     @property
     @checkerr
@@ -165,6 +1195,27 @@ class DokuWikiClient(object):
         """DokuWiki version reported by the remote Wiki."""
         return self._xmlrpc.dokuwiki.getVersion()
 
+    def ping(self):
+        """Check that the remote Wiki is reachable.
+
+        Return the supported RPC version (see rpc_version_supported()). The
+        result is cached per URL, so only the first client of a Wiki in a
+        process pays for the round trip. If the remote Wiki is not reachable
+        we raise a DokuWikiURLError.
+        """
+        version = _PING_CACHE.get(self._url)
+        if version is None:
+            validated, self._validated = self._validated, True
+            try:
+                version = self.rpc_version_supported()
+            except (socket.error, http_client.HTTPException):
+                raise DokuWikiURLError(self._url)
+            finally:
+                self._validated = validated or version is not None
+            _PING_CACHE[self._url] = version
+        self._validated = True
+        return version
+
     @checkerr
     def rpc_version_supported(self):
         """Return the supported RPC version reported by the remote Wiki."""
@@ -179,14 +1230,33 @@ class DokuWikiClient(object):
 
         """
         if not revision:
-            return self._xmlrpc.wiki.getPage(page_id)
+            return self._cached(False, 'wiki.getPage', page_id)
         else:
-            return self._xmlrpc.wiki.getPageVersion(page_id, revision)
+            return self._cached(True, 'wiki.getPageVersion', page_id, revision)
 
     @checkerr
     def page_versions(self, page_id, offset=0):
         """Return a list of available versions for a Wiki page."""
-        return self._xmlrpc.wiki.getPageVersions(page_id, offset)
+        return self._cached(False, 'wiki.getPageVersions', page_id, offset)
+
+    def iter_page_versions(self, page_id):
+        """Yield all versions of a Wiki page, newest first.
+
+        page_versions() returns at most $conf['recent'] versions per call,
+        this follows the offsets until the whole history was listed. DokuWiki
+        starts over at the newest version for an offset past the end, so
+        versions already seen end the iteration.
+        """
+        seen = set()
+        while True:
+            batch = [version for version in
+                     self.page_versions(page_id, len(seen))
+                     if version['version'] not in seen]
+            if not batch:
+                return
+            seen.update(version['version'] for version in batch)
+            for version in batch:
+                yield version
 
     @checkerr
     def page_info(self, page_id, revision=None):
@@ -197,9 +1267,10 @@ class DokuWikiClient(object):
 
         """
         if not revision:
-            return self._xmlrpc.wiki.getPageInfo(page_id)
+            return self._cached(False, 'wiki.getPageInfo', page_id)
         else:
-            return self._xmlrpc.wiki.getPageInfoVersion(page_id, revision)
+            return self._cached(True, 'wiki.getPageInfoVersion', page_id,
+                                revision)
 
     @checkerr
     def page_html(self, page_id, revision=None):
@@ -210,9 +1281,88 @@ class DokuWikiClient(object):
 
         """
         if not revision:
-            return self._xmlrpc.wiki.getPageHTML(page_id)
+            return self._cached(False, 'wiki.getPageHTML', page_id)
         else:
-            return self._xmlrpc.wiki.getPageHTMLVersion(page_id, revision)
+            return self._cached(True, 'wiki.getPageHTMLVersion', page_id,
+                                revision)
+
+    @checkerr
+    def multicall(self, calls, chunk_size=None):
+        """Run a batch of XML-RPC calls using system.multicall.
+
+        calls is an iterable of (method, args) tuples, e.g.
+        ('wiki.getPage', ('start',)). The calls are sent in chunks of
+        chunk_size calls (defaults to the client's chunk_size), which costs
+        one round trip per chunk instead of one per call.
+
+        Return a list with one result per call, in the order of calls. A call
+        that failed on the remote Wiki does not fail the whole batch: its
+        result is the corresponding DokuWikiXMLRPCError instance instead.
+
+        """
+        chunk_size = chunk_size or self._chunk_size
+        results = []
+        chunk = []
+        for method, args in calls:
+            chunk.append({'methodName': method, 'params': list(args)})
+            if len(chunk) >= chunk_size:
+                results.extend(self._multicall_chunk(chunk))
+                chunk = []
+        if chunk:
+            results.extend(self._multicall_chunk(chunk))
+        return results
+
+    def _multicall_chunk(self, chunk):
+        """Send a single system.multicall request and unpack its results."""
+        results = []
+        for item in self._xmlrpc.system.multicall(chunk):
+            if isinstance(item, dict):
+                fault = xmlrpclib.Fault(item.get('faultCode', 0),
+                                        item.get('faultString', ''))
+                results.append(DokuWikiXMLRPCError(fault))
+            else:
+                results.append(item[0])
+        return results
+
+    def pages(self, page_ids, chunk_size=None):
+        """Return the raw Wiki text of several Wiki pages (see multicall())."""
+        return self.multicall([('wiki.getPage', (page_id,))
+                               for page_id in page_ids], chunk_size)
+
+    def page_infos(self, page_ids, chunk_size=None):
+        """Return information about several Wiki pages (see multicall())."""
+        return self.multicall([('wiki.getPageInfo', (page_id,))
+                               for page_id in page_ids], chunk_size)
+
+    def page_htmls(self, page_ids, chunk_size=None):
+        """Return the (X)HTML body of several Wiki pages (see multicall())."""
+        return self.multicall([('wiki.getPageHTML', (page_id,))
+                               for page_id in page_ids], chunk_size)
+
+    def map_pages(self, page_ids, fn=None, workers=4, ordered=True):
+        """Call fn for many Wiki pages concurrently.
+
+        Yield (page_id, result) pairs of fn(page_id) computed on a pool of
+        workers threads, fn defaults to page(). Any single argument method
+        can be used, e.g. fn=client.page_html or fn=client.get_file. Results
+        are yielded in the order of page_ids if ordered is True, otherwise as
+        soon as they are available. Errors are collected per page: if fn
+        raises a DokuWikiError for a page, the error is yielded as its result.
+        Network errors are yielded wrapped in a DokuWikiConnectionError.
+        """
+        return _parallel_map(fn or self.page, page_ids, workers, ordered)
+
+    def put_pages(self, items, workers=4, ordered=True):
+        """Send many Wiki pages to the remote Wiki concurrently.
+
+        items is an iterable of tuples of put_page() arguments, i.e.
+        (page_id, text[, summary[, minor]]). Yield (page_id, result) pairs
+        like map_pages().
+        """
+        def put(item):
+            return self.put_page(*item)
+        for item, result in _parallel_map(put, items, workers, ordered):
+            yield item[0], result
 
     @checkerr
     def put_page(self, page_id, text, summary='', minor=False):
@@ -229,6 +1379,8 @@ class DokuWikiClient(object):
         params['sum'] = summary
         params['minor'] = minor
         self._xmlrpc.wiki.putPage(page_id, text, params)
+        if self._cache is not None:
+            self._cache.invalidate(self._url, page_id)
 
     @checkerr
     def append_page(self, page_id, text, summary='', minor=False):
@@ -245,6 +1397,8 @@ class DokuWikiClient(object):
         params['sum'] = summary
         params['minor'] = minor
         self._xmlrpc.dokuwiki.appendPage(page_id, text, params)
+        if self._cache is not None:
+            self._cache.invalidate(self._url, page_id)
 
     @checkerr
     def pagelist(self, namespace, opts = {'depth': 0, 'hash': False, 'skipacl': False}):
@@ -263,6 +1417,166 @@ class DokuWikiClient(object):
         """List all pages of the remote Wiki."""
         return self._xmlrpc.wiki.getAllPages()
 
+    def _iter_list(self, method, args, convert=None):
+        """Yield the items returned by an XML-RPC method returning an array.
+
+        The items are yielded while the response is still being read (see
+        _ListParser).
+        """
+        host, handler = self._endpoint()
+        body = xmlrpclib.dumps(tuple(args), method).encode('utf-8')
+        parser = _ListParser(convert)
+        with xmlrpc_errors():
+            with self._transport.open_stream(host, handler,
+                                             body) as response:
+                while True:
+                    chunk = response.read(65536)
+                    parser.feed(chunk)
+                    while parser.items:
+                        yield parser.items.popleft()
+                    if not chunk:
+                        break
+
+    def iter_pagelist(self, namespace,
+                      opts={'depth': 0, 'hash': False, 'skipacl': False},
+                      records=False):
+        """Iterate over the pages within a given namespace (see pagelist()).
+
+        Unlike pagelist() the pages are yielded while the response is read.
+        If records is True, PageEntry records are yielded instead of dicts.
+        """
+        return self._iter_list('dokuwiki.getPagelist', (namespace, opts),
+                               _record(PageEntry) if records else None)
+
+    def iter_all_pages(self, records=False):
+        """Iterate over all pages of the remote Wiki (see all_pages()).
+
+        Unlike all_pages() the pages are yielded while the response is read.
+        If records is True, PageEntry records are yielded instead of dicts.
+        """
+        return self._iter_list('wiki.getAllPages', (),
+                               _record(PageEntry) if records else None)
+
+    def iter_recent_changes(self, timestamp, records=False):
+        """Iterate over the recent changes since a given timestamp (UTC).
+
+        Unlike recent_changes() the changes are yielded while the response is
+        read. If records is True, ChangeEntry records are yielded instead of
+        dicts.
+        """
+        return self._iter_list('wiki.getRecentChanges', (timestamp,),
+                               _record(ChangeEntry) if records else None)
+
+    def _list_subtree(self, namespace, media):
+        """Return the listings of a namespace and of every namespace below.
+
+        The result maps each namespace to a (namespaces, pages, media) tuple
+        of its sub-namespaces and of its own pages and media files. The page
+        and media listings of the subtree are streamed once and split by
+        namespace, so namespaces which only contain media files or further
+        namespaces are found as well.
+        """
+        prefix = namespace + ':' if namespace else ''
+        tree = {namespace: ([], [], [])}
+
+        def add(item, index):
+            current = namespace
+            for part in item['id'][len(prefix):].split(':')[:-1]:
+                parent = current
+                current = current + ':' + part if current else part
+                if current not in tree:
+                    tree[current] = ([], [], [])
+                    tree[parent][0].append(current)
+            tree[current][index].append(item)
+        for item in self.iter_pagelist(namespace, {'depth': 0, 'hash': False,
+                                                   'skipacl': False}):
+            add(item, 1)
+        if media:
+            for item in self._iter_list('wiki.getAttachments',
+                                        (namespace, {'recursive': True})):
+                add(item, 2)
+        for namespaces, _, _ in tree.values():
+            namespaces.sort()
+        return tree
+
+    def walk(self, namespace='', include=None, exclude=None, media=True,
+             workers=4, cursor=None):
+        """Walk the namespace tree below namespace, like os.walk().
+
+        Yield a WalkEntry(namespace, namespaces, pages, media, cursor) for
+        every namespace, where pages and media are the listings (dicts as
+        returned by pagelist() and list_files()) of the namespace itself.
+        Namespaces are yielded level by level.
+
+        include and exclude are lists of fnmatch patterns. Only pages and
+        media matching an include pattern are yielded, while excluded
+        namespaces are not walked at all. To resume an interrupted walk, pass
+        the cursor of the last entry processed as cursor.
+
+        DokuWiki's depth-limited listings cannot report namespaces without
+        pages of their own, so the pages and media files below namespace
+        are listed in one streamed response each and split among the
+        sub-namespaces, which need no further requests. Every id is thus
+        transferred once. The namespaces of a cursor are listed separately,
+        with up to workers listings in flight at once.
+        """
+        def wanted(item_id):
+            if exclude and any(fnmatch(item_id, pat) for pat in exclude):
+                return False
+            return not include or any(fnmatch(item_id, pat)
+                                      for pat in include)
+
+        queue = deque(cursor if cursor is not None else [namespace])
+        tree = {}
+        in_flight = {}
+        executor = None
+        if workers > 1 and ThreadPoolExecutor is not None:
+            executor = ThreadPoolExecutor(workers)
+        try:
+            while queue or in_flight:
+                if queue and queue[0] in tree:
+                    # Listed along with an ancestor.
+                    done = [queue.popleft()]
+                elif executor is None:
+                    current = queue.popleft()
+                    tree.update(self._list_subtree(current, media))
+                    done = [current]
+                else:
+                    while queue and queue[0] not in tree and \
+                            len(in_flight) < workers:
+                        current = queue.popleft()
+                        future = executor.submit(self._list_subtree,
+                                                 current, media)
+                        in_flight[future] = current
+                    if queue and queue[0] in tree:
+                        continue
+                    finished = wait(list(in_flight),
+                                    return_when=FIRST_COMPLETED)[0]
+                    done = []
+                    for future in finished:
+                        done.append(in_flight.pop(future))
+                        tree.update(future.result())
+                for index, current in enumerate(done):
+                    namespaces, pages, files = tree.pop(current)
+                    for ns in namespaces:
+                        if exclude and any(fnmatch(ns, pat)
+                                           for pat in exclude):
+                            _prune(tree, ns)
+                    namespaces = [ns for ns in namespaces if ns in tree]
+                    queue.extend(namespaces)
+                    # Resume with everything not yielded yet, including the
+                    # remaining namespaces listed in the same round.
+                    cursor = (list(queue) + list(in_flight.values()) +
+                              done[index + 1:])
+                    yield WalkEntry(
+                        current, namespaces,
+                        [page for page in pages if wanted(page['id'])],
+                        [item for item in files if wanted(item['id'])],
+                        sorted(cursor))
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False)
+
     @checkerr
     def backlinks(self, page_id):
         """Return a list of pages that link back to a Wiki page."""
@@ -278,6 +1592,11 @@ class DokuWikiClient(object):
         """Return the recent changes since a given timestampe (UTC)."""
         return self._xmlrpc.wiki.getRecentChanges(timestamp)
 
+    @checkerr
+    def recent_media_changes(self, timestamp):
+        """Return the recent media changes since a given timestamp (UTC)."""
+        return self._xmlrpc.wiki.getRecentMediaChanges(timestamp)
+
     @checkerr
     def acl_check(self, page_id):
         """Return the permissions of a Wiki page."""
@@ -300,6 +1619,73 @@ class DokuWikiClient(object):
         return self._xmlrpc.wiki.putAttachment(file_id, xmlrpclib.Binary(data),
                                                {'ow': overwrite})
 
+    @checkerr
+    def download_file(self, file_id, fileobj):
+        """Download a file from a remote Wiki into fileobj.
+
+        fileobj is a file-like object opened for binary writing or a writable
+        buffer (bytearray, memoryview) large enough for the file. Unlike
+        get_file() the data is base64-decoded and written while the response
+        is read, so the file is never held in memory as a whole. Return the
+        number of bytes written.
+        """
+        host, handler = self._endpoint()
+        body = xmlrpclib.dumps((file_id,), 'wiki.getAttachment')
+        with self._transport.open_stream(host, handler,
+                                         body.encode('utf-8')) as response:
+            return _Base64Writer(fileobj).feed(response)
+
+    @checkerr
+    def upload_file(self, file_id, fileobj, overwrite=False, size=None):
+        """Upload a file from fileobj to a remote Wiki.
+
+        fileobj is a file-like object opened for binary reading or a buffer
+        (bytes, memoryview). Unlike put_file() the data is read and
+        base64-encoded in chunks while the request is sent. size is the
+        number of bytes to upload and defaults to the rest of fileobj, which
+        then has to be seekable.
+        """
+        start = None
+        if hasattr(fileobj, 'read'):
+            try:
+                start = fileobj.tell()
+            except (AttributeError, IOError, OSError):
+                pass
+        if size is None:
+            if hasattr(fileobj, 'read'):
+                fileobj.seek(0, os.SEEK_END)
+                size = fileobj.tell() - start
+                fileobj.seek(start)
+            else:
+                size = memoryview(fileobj).nbytes
+        body = xmlrpclib.dumps((file_id, xmlrpclib.Binary(b''),
+                                {'ow': overwrite}), 'wiki.putAttachment')
+        head, tail = body.split('<base64>\n', 1)
+        head = (head + '<base64>\n').encode('utf-8')
+        tail = tail.encode('utf-8')
+        length = len(head) + (size + 2) // 3 * 4 + len(tail)
+
+        attempts = []
+
+        def chunks():
+            # A retry has to send the data from the start again.
+            if attempts and start is not None:
+                fileobj.seek(start)
+            elif attempts and hasattr(fileobj, 'read'):
+                raise DokuWikiError('Cannot resend the upload of %s, the file '
+                                    'is not seekable.' % file_id)
+            attempts.append(None)
+            yield head
+            for chunk in _iter_base64(fileobj, size):
+                yield chunk
+            yield tail
+
+        host, handler = self._endpoint()
+        with self._transport.open_stream(host, handler, chunks,
+                                         content_length=length) as response:
+            result = self._transport.parse_response(response)
+        return result[0] if len(result) == 1 else result
+
     @checkerr
     def delete_file(self, file_id):
         """Delete a file from a remote wiki."""
@@ -350,6 +1736,1361 @@ class DokuWikiClient(object):
         """Get the data that would be shown in an aggregation"""
         return self._xmlrpc.plugin.struct.getAggregationData(schema_names, columns, aggregation_logic, column)
 
+    def _struct_columns(self, schema):
+        """Return the column names of a struct schema (cached)."""
+        columns = self._struct_schemas.get(schema)
+        if columns is None:
+            result = self.struct_getschema(schema)
+            columns = [column.get('name') or column.get('label')
+                       for column in result.get(schema, [])]
+            self._struct_schemas[schema] = columns
+        return columns
+
+    def _struct_rows(self, schema, columns, pages, workers):
+        """Yield the rows of struct data of a schema as lists of values."""
+        if pages is None:
+            # Qualified column names, the keys of the rows are either these
+            # or the bare column names.
+            names = ['%s.%s' % (schema, column) for column in columns]
+            keys = {'%pageid%': 0}
+            for index, (name, column) in enumerate(zip(names, columns), 1):
+                keys[name] = keys[column] = index
+            rows = self._iter_list('plugin.struct.getAggregationData',
+                                   ([schema], ['%pageid%'] + names, {}, ''))
+            for row in rows:
+                values = [None] * (len(columns) + 1)
+                for key, value in row.items():
+                    if key not in keys:
+                        raise DokuWikiError('Unexpected column %r in the '
+                                            'struct data of %s.'
+                                            % (key, schema))
+                    values[keys[key]] = value
+                yield values
+            return
+
+        def fetch(chunk):
+            return self.multicall([('plugin.struct.getData', (page, schema, 0))
+                                   for page in chunk], len(chunk))
+        chunks = _chunks(pages, self._chunk_size)
+        for chunk, results in _parallel_map(fetch, chunks, workers):
+            if isinstance(results, DokuWikiError):
+                raise results
+            for page_id, data in zip(chunk, results):
+                if isinstance(data, DokuWikiError) or not data.get(schema):
+                    continue
+                row = data[schema]
+                yield [page_id] + [row.get(column) for column in columns]
+
+    def struct_export(self, schema, pages=None, out=None, fmt='columns',
+                      workers=4):
+        """Export the struct data of a schema in tabular form.
+
+        The column names of the schema are fetched once per client with
+        struct_getschema(). If pages is None, all rows of the schema are
+        fetched with a single aggregation call. Otherwise the data of the
+        given pages is fetched with batched struct.getData calls on workers
+        threads, skipping pages without data for the schema. Every row has the
+        page id in the column 'pid' followed by the schema columns.
+
+        If out is None, return a dict mapping the column names to lists of
+        values. Otherwise the rows are written to the text file out as they
+        arrive, as CSV if fmt is 'csv' (multiple values joined with ', ') or
+        as JSON lines if fmt is 'jsonl', and the number of rows is returned.
+        """
+        columns = self._struct_columns(schema)
+        header = ['pid'] + columns
+        rows = self._struct_rows(schema, columns, pages, workers)
+        if out is None:
+            table = dict((column, []) for column in header)
+            for row in rows:
+                for column, value in zip(header, row):
+                    table[column].append(value)
+            return table
+        if fmt not in ('csv', 'jsonl'):
+            raise ValueError('Unsupported export format %r.' % fmt)
+        writer = csv.writer(out) if fmt == 'csv' else None
+        if writer is not None:
+            writer.writerow(header)
+        count = 0
+        for row in rows:
+            if writer is not None:
+                writer.writerow([', '.join(map(str, value))
+                                 if isinstance(value, list) else value
+                                 for value in row])
+            else:
+                out.write(json.dumps(dict(zip(header, row)), default=str))
+                out.write('\n')
+            count += 1
+        return count
+
+    def _page_history(self, page_id):
+        """Return [(revision, text)] of the old revisions of a page.
+
+        The version list includes the current revision, which is left out
+        as export_wiki() stores it with the page itself. text is a
+        DokuWikiError for revisions that could not be fetched.
+        """
+        current = self.page_info(page_id).get('version')
+        revisions = sorted(set(version['version'] for version in
+                               self.iter_page_versions(page_id)
+                               if version['version'] != current))
+        texts = self.multicall([('wiki.getPageVersion', (page_id, revision))
+                                for revision in revisions])
+        return list(zip(revisions, texts))
+
+    def export_wiki(self, path, history=False, media=True, workers=4):
+        """Export the whole Wiki into the zip archive path.
+
+        Pages are stored as pages/<namespace>/<page>.txt, old revisions (if
+        history is True) as attic/<namespace>/<page>.<revision>.txt and media
+        files as media/<namespace>/<file>. The index manifest.json lists the
+        archived items with their revisions and archive paths. Pages are
+        fetched by workers threads and written to the archive as they arrive.
+        Media files are downloaded by workers threads as well, each into a
+        temporary file which is added to the archive and removed, so the
+        Wiki is never held in memory. Return a dict with the numbers of
+        archived 'pages' and 'media' and the 'errors' per id, where old
+        revisions which could not be fetched are keyed '<page>@<revision>'.
+        """
+        manifest = {'version': 1, 'history': history, 'pages': {},
+                    'media': {}}
+        errors = {}
+        pages = dict((page['id'], page) for page in self.all_pages())
+
+        def fetch_page(page_id):
+            if history:
+                return self.page(page_id), self._page_history(page_id)
+            return self.page(page_id), []
+
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED,
+                             allowZip64=True) as archive:
+            for page_id, result in _parallel_map(fetch_page, sorted(pages),
+                                                 workers):
+                if isinstance(result, DokuWikiError):
+                    errors[page_id] = result
+                    continue
+                text, revisions = result
+                entry = {'path': _archive_path('pages', page_id, '.txt'),
+                         'lastModified': _timestamp(
+                             pages[page_id].get('lastModified')),
+                         'revisions': []}
+                archive.writestr(entry['path'], text.encode('utf-8'))
+                for revision, old_text in revisions:
+                    if isinstance(old_text, DokuWikiError):
+                        errors['%s@%d' % (page_id, revision)] = old_text
+                        continue
+                    old_path = _archive_path('attic', page_id,
+                                             '.%d.txt' % revision)
+                    archive.writestr(old_path, old_text.encode('utf-8'))
+                    entry['revisions'].append([revision, old_path])
+                manifest['pages'][page_id] = entry
+            files = self.list_files('', recursive=True) if media else []
+            temp_dir = tempfile.mkdtemp()
+
+            def download(job):
+                index, item = job
+                temp_path = os.path.join(temp_dir, str(index))
+                with open(temp_path, 'wb') as target:
+                    return temp_path, self.download_file(item['id'], target)
+
+            try:
+                for (index, item), result in _parallel_map(
+                        download, enumerate(files), workers):
+                    if isinstance(result, DokuWikiError):
+                        errors[item['id']] = result
+                        continue
+                    temp_path, size = result
+                    name = _archive_path('media', item['id'])
+                    archive.write(temp_path, name)
+                    os.remove(temp_path)
+                    manifest['media'][item['id']] = {
+                        'path': name, 'size': size, 'mtime': _revision(item)}
+            finally:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+            archive.writestr('manifest.json',
+                             json.dumps(manifest, indent=1, sort_keys=True))
+        return {'pages': len(manifest['pages']),
+                'media': len(manifest['media']), 'errors': errors}
+
+    def import_wiki(self, path, history=False, resume=True, workers=4,
+                    summary='Imported'):
+        """Import an archive created by export_wiki() into the remote Wiki.
+
+        Pages are written with up to workers concurrent put_page() calls and
+        media files are streamed with upload_file(), overwriting existing
+        ones. If history is True, the archived old revisions of a page are
+        written before its current text, oldest first (they get new
+        timestamps). The ids of the imported items are appended to
+        path + '.progress'; if resume is True, items listed there are
+        skipped, so an interrupted import can be resumed. Return a dict with
+        the numbers of imported 'pages' and 'media' and the 'errors' per id.
+        """
+        progress_path = path + '.progress'
+        done = set()
+        if resume and os.path.exists(progress_path):
+            with open(progress_path) as progress:
+                done = set(line.rstrip('\n') for line in progress)
+        errors = {}
+        counts = {'pages': 0, 'media': 0}
+        with zipfile.ZipFile(path) as archive, \
+                open(progress_path, 'a' if resume else 'w') as progress:
+            manifest = json.loads(
+                archive.read('manifest.json').decode('utf-8'))
+
+            def put(page_id):
+                entry = manifest['pages'][page_id]
+                if history:
+                    for revision, old_path in entry['revisions']:
+                        self.put_page(page_id, archive.read(
+                            old_path).decode('utf-8'), summary)
+                self.put_page(page_id, archive.read(
+                    entry['path']).decode('utf-8'), summary)
+
+            def upload(file_id):
+                entry = manifest['media'][file_id]
+                with archive.open(entry['path']) as source:
+                    return self.upload_file(file_id, source, overwrite=True,
+                                            size=entry['size'])
+
+            for kind, func in (('pages', put), ('media', upload)):
+                todo = sorted(item_id for item_id in manifest[kind]
+                              if item_id not in done)
+                for item_id, result in _parallel_map(func, todo, workers,
+                                                     ordered=False):
+                    if isinstance(result, DokuWikiError):
+                        errors[item_id] = result
+                        continue
+                    progress.write(item_id + '\n')
+                    progress.flush()
+                    counts[kind] += 1
+        counts['errors'] = errors
+        return counts
+
+
+# DokuWiki fault codes
+FILE_NOT_FOUND = 221
+NO_CHANGES = 321
+
+
+def _id_path(root, item_id, suffix=''):
+    """Map a Wiki page or media id to a file path below root."""
+    parts = [part for part in item_id.split(':')
+             if part not in ('', '.', '..')]
+    return os.path.join(root, *parts) + suffix
+
+
+def _archive_path(prefix, item_id, suffix=''):
+    """Map a Wiki page or media id to a path in a zip archive."""
+    return '/'.join([prefix] + [part for part in item_id.split(':')
+                                if part not in ('', '.', '..')]) + suffix
+
+
+def _makedirs(directory):
+    """Create directory and its parents unless they exist."""
+    try:
+        os.makedirs(directory)
+    except OSError as error:
+        # Another thread or process may have created it meanwhile.
+        if error.errno != errno.EEXIST or not os.path.isdir(directory):
+            raise
+
+
+def _write_file(path, data):
+    """Atomically replace the file at path with data (bytes)."""
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        _makedirs(directory)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as tmp:
+        tmp.write(data)
+    getattr(os, 'replace', os.rename)(tmp_path, path)
+
+
+class _HashingWriter(object):
+    """File-like object updating a hash with the data written to fileobj."""
+
+    def __init__(self, fileobj, hash_object):
+        """Initialize the writer."""
+        self._fileobj = fileobj
+        self._hash = hash_object
+
+    def write(self, data):
+        """Write data and add it to the hash."""
+        self._hash.update(data)
+        self._fileobj.write(data)
+
+
+def _prune(tree, namespace):
+    """Remove a namespace and the namespaces below it from a listing tree."""
+    for ns in tree.pop(namespace, ((),))[0]:
+        _prune(tree, ns)
+
+
+def _revision(item):
+    """Return the revision timestamp of a page/media listing or change."""
+    for key in ('version', 'rev', 'mtime'):
+        if item.get(key):
+            return int(item[key])
+    return 0
+
+
+def _timestamp(value):
+    """Convert a revision number or an xmlrpclib.DateTime to a timestamp."""
+    if isinstance(value, xmlrpclib.DateTime):
+        return calendar.timegm(value.timetuple())
+    return int(value or 0)
+
+
+def _chunks(items, size):
+    """Yield lists of up to size items."""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _changes_since(method, timestamp):
+    """Call a recent changes method, mapping 'no changes' to []."""
+    try:
+        return method(timestamp)
+    except DokuWikiXMLRPCError as error:
+        if error.page_id == NO_CHANGES:
+            return []
+        raise
+
+
+class DokuWikiMirror(object):
+    """Incremental local copy of a remote Wiki.
+
+    Pages are stored as <path>/pages/<namespace>/<page>.txt and media files as
+    <path>/media/<namespace>/<file>. The state file <path>/state.json records
+    the timestamp of the last sync and the revision and md5 of every mirrored
+    page and media file.
+
+    The first sync() (or a sync(full=True)) lists the whole Wiki with page
+    hashes and fetches whatever differs from the local copy. Subsequent syncs
+    only ask for the recent changes since the last sync and fetch pages and
+    media whose revision changed.
+    """
+
+    def __init__(self, client, path, workers=4, media=True):
+        """Create a mirror of the Wiki of client in the directory path."""
+        self._client = client
+        self._path = path
+        self._workers = workers
+        self._media = media
+        self._state_path = os.path.join(path, 'state.json')
+        if os.path.exists(self._state_path):
+            with open(self._state_path) as state_file:
+                self._state = json.load(state_file)
+        else:
+            self._state = {'timestamp': 0, 'pages': {}, 'media': {}}
+
+    @property
+    def timestamp(self):
+        """Timestamp of the newest change seen by the last sync."""
+        return self._state['timestamp']
+
+    def page_ids(self):
+        """Return the ids of all mirrored pages."""
+        return list(self._state['pages'])
+
+    def page_path(self, page_id):
+        """Return the local path of a Wiki page."""
+        return _id_path(os.path.join(self._path, 'pages'), page_id, '.txt')
+
+    def media_path(self, file_id):
+        """Return the local path of a media file."""
+        return _id_path(os.path.join(self._path, 'media'), file_id)
+
+    def read_page(self, page_id):
+        """Return the raw Wiki text of a mirrored page."""
+        with open(self.page_path(page_id), 'rb') as page_file:
+            return page_file.read().decode('utf-8')
+
+    def sync(self, full=False):
+        """Bring the local copy up to date with the remote Wiki.
+
+        Return a dict listing the 'pages' and 'media' which were updated, the
+        ids which were 'deleted' and the 'errors' per id. Items which failed
+        are fetched again by the next sync.
+        """
+        result = {'pages': [], 'media': [], 'deleted': [], 'errors': {}}
+        full = full or not self._state['timestamp']
+        if full:
+            newest = self._sync_all_pages(result)
+            if self._media:
+                newest = max(newest, self._sync_all_media(result))
+        else:
+            since = self._state['timestamp']
+            changes = _changes_since(self._client.recent_changes, since)
+            newest = self._fetch_pages(self._changed(changes, 'pages'), result)
+            if self._media:
+                changes = _changes_since(self._client.recent_media_changes,
+                                         since)
+                newest = max(newest, self._fetch_media(
+                    self._changed(changes, 'media'), result))
+        if not result['errors']:
+            self._state['timestamp'] = max(newest, self._state['timestamp'])
+        self._save_state()
+        return result
+
+    def _changed(self, changes, kind):
+        """Return {id: revision} of the changes not yet mirrored."""
+        known = self._state[kind]
+        changed = {}
+        for change in changes:
+            item_id = change.get('name') or change.get('id')
+            revision = _revision(change)
+            if known.get(item_id, {}).get('rev') != revision:
+                changed[item_id] = max(revision, changed.get(item_id, 0))
+        return changed
+
+    def _sync_all_pages(self, result):
+        """Compare a full hashed page listing with the local state."""
+        known = self._state['pages']
+        listing = self._client.pagelist('', {'depth': 0, 'hash': True,
+                                             'skipacl': False})
+        changed = {}
+        for item in listing:
+            if known.get(item['id'], {}).get('hash') != item.get('hash'):
+                changed[item['id']] = _revision(item)
+        remote = set(item['id'] for item in listing)
+        for page_id in set(known) - remote:
+            self._delete(page_id, 'pages', result)
+        self._fetch_pages(changed, result)
+        return max([_revision(item) for item in listing] or [0])
+
+    def _sync_all_media(self, result):
+        """Compare a full media listing with the local state."""
+        known = self._state['media']
+        listing = self._client.list_files('', recursive=True)
+        changed = {}
+        for item in listing:
+            if known.get(item['id'], {}).get('rev') != _revision(item):
+                changed[item['id']] = _revision(item)
+        remote = set(item['id'] for item in listing)
+        for file_id in set(known) - remote:
+            self._delete(file_id, 'media', result)
+        self._fetch_media(changed, result)
+        return max([_revision(item) for item in listing] or [0])
+
+    def _fetch_pages(self, changed, result):
+        """Fetch and store changed pages, return the newest revision."""
+        known = self._state['pages']
+        for page_id, text in self._client.map_pages(sorted(changed),
+                                                    workers=self._workers,
+                                                    ordered=False):
+            if isinstance(text, DokuWikiError):
+                result['errors'][page_id] = text
+                continue
+            if not text:
+                # DokuWiki returns an empty text for deleted pages.
+                self._delete(page_id, 'pages', result)
+                continue
+            data = text.encode('utf-8')
+            md5 = hashlib.md5(data).hexdigest()
+            if known.get(page_id, {}).get('hash') != md5:
+                _write_file(self.page_path(page_id), data)
+                result['pages'].append(page_id)
+            known[page_id] = {'rev': changed[page_id], 'hash': md5}
+        return max(list(changed.values()) or [0])
+
+    def _fetch_media(self, changed, result):
+        """Fetch and store changed media, return the newest revision."""
+        known = self._state['media']
+        for file_id, md5 in self._client.map_pages(sorted(changed),
+                                                   fn=self._download_media,
+                                                   workers=self._workers,
+                                                   ordered=False):
+            if isinstance(md5, DokuWikiError):
+                if isinstance(md5, DokuWikiXMLRPCError) and \
+                        md5.page_id == FILE_NOT_FOUND:
+                    self._delete(file_id, 'media', result)
+                else:
+                    result['errors'][file_id] = md5
+                continue
+            path = self.media_path(file_id)
+            if known.get(file_id, {}).get('hash') != md5:
+                getattr(os, 'replace', os.rename)(path + '.tmp', path)
+                result['media'].append(file_id)
+            else:
+                os.remove(path + '.tmp')
+            known[file_id] = {'rev': changed[file_id], 'hash': md5}
+        return max(list(changed.values()) or [0])
+
+    def _download_media(self, file_id):
+        """Download a media file next to its local path, return its md5.
+
+        The file is written to <path>.tmp and hashed while it is streamed,
+        so it is never held in memory.
+        """
+        tmp_path = self.media_path(file_id) + '.tmp'
+        directory = os.path.dirname(tmp_path)
+        if not os.path.isdir(directory):
+            _makedirs(directory)
+        md5 = hashlib.md5()
+        try:
+            with open(tmp_path, 'wb') as tmp:
+                self._client.download_file(file_id, _HashingWriter(tmp, md5))
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        return md5.hexdigest()
+
+    def _delete(self, item_id, kind, result):
+        """Remove a page or media file from the local copy."""
+        if kind == 'pages':
+            path = self.page_path(item_id)
+        else:
+            path = self.media_path(item_id)
+        if os.path.exists(path):
+            os.remove(path)
+        if self._state[kind].pop(item_id, None) is not None:
+            result['deleted'].append(item_id)
+
+    def _save_state(self):
+        """Atomically write the state file."""
+        _write_file(self._state_path,
+                    json.dumps(self._state, sort_keys=True).encode('utf-8'))
+
+
+def _crawl_worker(args, kwargs, path, tasks, results):
+    """Process crawl tasks from the queue tasks until a None is received.
+
+    Puts a (kind, item_id, error, deleted) tuple for every item on the queue
+    results, where error is None or the error message of a failed item and
+    deleted is True for a page whose text was empty, i.e. that does not
+    exist (anymore). Its file is removed instead of written.
+    """
+    client = DokuWikiClient(*args, **kwargs)
+    for kind, item_ids in iter(tasks.get, None):
+        # Anything raised must be reported, the parent waits for every item.
+        try:
+            if kind == 'pages':
+                texts = client.pages(item_ids, len(item_ids))
+            else:
+                texts = [None] * len(item_ids)
+        except Exception as error:
+            texts = [error] * len(item_ids)
+        for item_id, text in zip(item_ids, texts):
+            deleted = False
+            try:
+                if isinstance(text, Exception):
+                    raise text
+                if kind == 'pages':
+                    page_path = _id_path(os.path.join(path, 'pages'),
+                                         item_id, '.txt')
+                    # DokuWiki returns an empty text for deleted pages.
+                    deleted = not text
+                    if not deleted:
+                        _write_file(page_path, text.encode('utf-8'))
+                    elif os.path.exists(page_path):
+                        os.remove(page_path)
+                else:
+                    file_path = _id_path(os.path.join(path, 'media'), item_id)
+                    if not os.path.isdir(os.path.dirname(file_path)):
+                        _makedirs(os.path.dirname(file_path))
+                    with open(file_path + '.tmp', 'wb') as tmp:
+                        client.download_file(item_id, tmp)
+                    getattr(os, 'replace', os.rename)(file_path + '.tmp',
+                                                      file_path)
+                results.put((kind, item_id, None, deleted))
+            except Exception as error:
+                results.put((kind, item_id, str(error) or repr(error), False))
+    client.close()
+
+
+class ProcessCrawler(object):
+    """Copy a remote Wiki to disk with a pool of processes.
+
+    XML unmarshalling and base64 decoding hold the GIL, so a single process
+    cannot use more than one core however many threads fetch the Wiki. The
+    crawler starts processes worker processes, each with its own
+    DokuWikiClient created from url, user, passwd and the keyword arguments
+    kwargs (which have to be picklable). They take batches of page ids and
+    single media ids from a shared queue, write pages as
+    <path>/pages/<namespace>/<page>.txt and media files as
+    <path>/media/<namespace>/<file> (the layout of DokuWikiMirror) and report
+    every item back to the parent process.
+    """
+
+    def __init__(self, url, user, passwd, path, processes=None, **kwargs):
+        """Create a crawler copying the Wiki at url into the directory path.
+
+        processes defaults to the number of CPUs.
+        """
+        kwargs.setdefault('lazy', True)
+        self._args = (url, user, passwd)
+        self._kwargs = kwargs
+        self._path = path
+        self._processes = processes or multiprocessing.cpu_count()
+        self._chunk_size = kwargs.get('chunk_size', 50)
+
+    def crawl(self, page_ids=None, media_ids=None, progress=None):
+        """Copy pages and media files to disk.
+
+        page_ids and media_ids default to all pages and all media files of
+        the Wiki (pass an empty list to skip either). progress is an optional
+        function called with the numbers of finished and of all items
+        whenever an item was finished. Return a dict with the numbers of
+        copied 'pages' and 'media', the ids of the empty (deleted) pages in
+        'deleted', whose files are removed, and the error messages per id in
+        'errors'.
+        """
+        if page_ids is None or media_ids is None:
+            client = DokuWikiClient(*self._args, **self._kwargs)
+            if page_ids is None:
+                page_ids = [page['id'] for page in client.all_pages()]
+            if media_ids is None:
+                media_ids = [item['id'] for item in
+                             client.list_files('', recursive=True)]
+            client.close()
+        tasks = multiprocessing.Queue()
+        results = multiprocessing.Queue()
+        for chunk in _chunks(page_ids, self._chunk_size):
+            tasks.put(('pages', chunk))
+        for file_id in media_ids:
+            tasks.put(('media', [file_id]))
+        workers = [multiprocessing.Process(
+            target=_crawl_worker,
+            args=(self._args, self._kwargs, self._path, tasks, results))
+            for _ in range(self._processes)]
+        for worker in workers:
+            tasks.put(None)
+            worker.daemon = True
+            worker.start()
+        pending = set(('pages', page_id) for page_id in page_ids)
+        pending.update(('media', file_id) for file_id in media_ids)
+        total = len(pending)
+        result = {'pages': 0, 'media': 0, 'deleted': [], 'errors': {}}
+        while pending:
+            try:
+                kind, item_id, error, deleted = results.get(timeout=1)
+            except Empty:
+                if any(worker.is_alive() for worker in workers):
+                    continue
+                for kind, item_id in pending:
+                    result['errors'][item_id] = 'Worker process exited.'
+                break
+            pending.discard((kind, item_id))
+            if deleted:
+                result['deleted'].append(item_id)
+            elif error is None:
+                result[kind] += 1
+            else:
+                result['errors'][item_id] = error
+            if progress is not None:
+                progress(total - len(pending), total)
+        for worker in workers:
+            worker.join()
+        return result
+
+
+class _ChangeTracker(object):
+    """Base of the local stores of a remote Wiki refreshed by update().
+
+    timestamp is the newest revision seen and errors maps the pages whose
+    last fetch failed to the error.
+    """
+
+    def __init__(self, client, workers=4, chunk_size=None):
+        """Initialize an empty store for the Wiki of client."""
+        self._client = client
+        self._workers = workers
+        self._chunk_size = chunk_size or client._chunk_size
+        self.timestamp = 0
+        self.errors = {}
+
+    def _update(self, fetch, wanted=None):
+        """Call fetch with the pages changed since timestamp and advance it.
+
+        Only the changed pages for which wanted returns True are passed if
+        wanted is given. Pages whose last fetch failed are fetched again.
+        """
+        changes = _changes_since(self._client.recent_changes, self.timestamp)
+        changed = set(change['name'] for change in changes)
+        if wanted is not None:
+            changed = set(filter(wanted, changed))
+        fetch(sorted(changed | set(self.errors)))
+        self.timestamp = max([self.timestamp] +
+                             [_revision(change) for change in changes])
+
+
+class LinkGraph(_ChangeTracker):
+    """Local index of the links between the pages of a remote Wiki.
+
+    build() fetches the links of all pages with batched listLinks calls, which
+    are sent by several threads in parallel. update() refetches the links of
+    the pages changed since the last build or update. Page ids are interned
+    to integers and the links of every page are stored as an array of those
+    integers, so links, backlinks, orphans and broken links can be queried
+    locally.
+    """
+
+    def __init__(self, client, workers=4, chunk_size=None):
+        """Create an empty link graph for the Wiki of client."""
+        _ChangeTracker.__init__(self, client, workers, chunk_size)
+        self._ids = []
+        self._index = {}
+        self._exists = bytearray()
+        self._links = {}
+        self._backlinks = None
+
+    def _intern(self, page_id):
+        """Return the integer of a page id, assigning one if needed."""
+        index = self._index.get(page_id)
+        if index is None:
+            index = self._index[page_id] = len(self._ids)
+            self._ids.append(page_id)
+            self._exists.append(0)
+        return index
+
+    def _fetch(self, page_ids):
+        """Fetch and store the links and existence of pages."""
+        def fetch(chunk):
+            calls = []
+            for page_id in chunk:
+                calls.append(('wiki.listLinks', (page_id,)))
+                calls.append(('wiki.getPageInfo', (page_id,)))
+            return self._client.multicall(calls, 2 * len(chunk))
+        chunks = _chunks(page_ids, self._chunk_size)
+        for chunk, results in _parallel_map(fetch, chunks, self._workers):
+            if isinstance(results, DokuWikiError):
+                raise results
+            for offset, page_id in enumerate(chunk):
+                links, info = results[2 * offset:2 * offset + 2]
+                index = self._intern(page_id)
+                self._exists[index] = not isinstance(info, DokuWikiError)
+                if isinstance(links, DokuWikiError):
+                    self.errors[page_id] = links
+                    links = []
+                else:
+                    self.errors.pop(page_id, None)
+                targets = set(link['page'].split('#')[0] for link in links
+                              if link.get('type') == 'local')
+                self._links[index] = array('i', sorted(
+                    self._intern(target) for target in targets if target))
+        self._backlinks = None
+
+    def build(self):
+        """Index the links of all pages of the remote Wiki."""
+        pages = self._client.all_pages()
+        self._links.clear()
+        self._exists = bytearray(len(self._ids))
+        self._fetch([page['id'] for page in pages])
+        self.timestamp = max([_timestamp(page.get('lastModified'))
+                              for page in pages] or [0])
+
+    def update(self):
+        """Reindex the pages changed since the last build or update."""
+        self._update(self._fetch)
+
+    def _ids_of(self, indices):
+        return [self._ids[index] for index in indices]
+
+    def pages(self):
+        """Return the ids of all existing pages."""
+        return [page_id for index, page_id in enumerate(self._ids)
+                if self._exists[index]]
+
+    def links(self, page_id):
+        """Return the pages a page links to."""
+        index = self._index.get(page_id)
+        return self._ids_of(self._links.get(index, ()))
+
+    def _backlink_index(self):
+        """Return the backlinks of all pages, building them if needed."""
+        if self._backlinks is None:
+            backlinks = {}
+            for source, targets in self._links.items():
+                if not self._exists[source]:
+                    continue
+                for target in targets:
+                    backlinks.setdefault(target, array('i')).append(source)
+            self._backlinks = backlinks
+        return self._backlinks
+
+    def backlinks(self, page_id):
+        """Return the existing pages linking to a page."""
+        index = self._index.get(page_id)
+        return self._ids_of(self._backlink_index().get(index, ()))
+
+    def orphans(self):
+        """Return the existing pages no other page links to."""
+        backlinks = self._backlink_index()
+        return [page_id for index, page_id in enumerate(self._ids)
+                if self._exists[index] and
+                not [source for source in backlinks.get(index, ())
+                     if source != index]]
+
+    def broken_links(self):
+        """Return a dict mapping pages to the missing pages they link to."""
+        broken = {}
+        for source, targets in self._links.items():
+            missing = [self._ids[target] for target in targets
+                       if not self._exists[target]]
+            if self._exists[source] and missing:
+                broken[self._ids[source]] = missing
+        return broken
+
+    def pagerank(self, damping=0.85, iterations=20):
+        """Return a dict mapping existing pages to their PageRank."""
+        nodes = [index for index in range(len(self._ids))
+                 if self._exists[index]]
+        if not nodes:
+            return {}
+        rank = dict((index, 1.0 / len(nodes)) for index in nodes)
+        for _ in range(iterations):
+            new_rank = dict((index, (1 - damping) / len(nodes))
+                            for index in nodes)
+            dangling = 0.0
+            for index in nodes:
+                targets = [target for target in self._links.get(index, ())
+                           if self._exists[target]]
+                if not targets:
+                    dangling += rank[index]
+                    continue
+                share = damping * rank[index] / len(targets)
+                for target in targets:
+                    new_rank[target] += share
+            for index in nodes:
+                new_rank[index] += damping * dangling / len(nodes)
+            rank = new_rank
+        return dict((self._ids[index], value) for index, value in rank.items())
+
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+_QUERY_PART = re.compile(r'(?:([\w.]+):)?(?:"([^"]*)"|(\S+))',
+                         re.UNICODE)
+
+
+def _words(text):
+    """Split text into lower case words."""
+    return [word.lower() for word in _WORD.findall(text)]
+
+
+class SearchIndex(_ChangeTracker):
+    """Local full-text index of the pages of a remote Wiki.
+
+    The index is an inverted index mapping every word to the pages it occurs
+    in and its positions in them, so word and phrase queries are answered
+    locally. Besides the page text (the field 'text') the struct data of the
+    given schemas is indexed, each column in its own field named
+    '<schema>.<column>'.
+
+    build() lists the whole Wiki with page hashes and only fetches the pages
+    that changed since they were indexed, index_mirror() indexes the pages of
+    a DokuWikiMirror instead of fetching them, and update() refetches the
+    pages changed since the last build or update. save() and load() store
+    the index in a JSON file.
+    """
+
+    def __init__(self, client, workers=4, chunk_size=None, schemas=()):
+        """Create an empty search index for the Wiki of client."""
+        _ChangeTracker.__init__(self, client, workers, chunk_size)
+        self._schemas = list(schemas)
+        self._postings = {}
+        self._lengths = {}
+        self._hashes = {}
+        self._terms = {}
+
+    def __len__(self):
+        """Return the number of indexed pages."""
+        return len(self._lengths)
+
+    def _add(self, page_id, field, text):
+        """Index the words of a field of a page."""
+        words = _words(text)
+        positions = {}
+        for position, word in enumerate(words):
+            positions.setdefault(word, array('i')).append(position)
+        postings = self._postings.setdefault(field, {})
+        for word, word_positions in positions.items():
+            postings.setdefault(word, {})[page_id] = word_positions
+        self._lengths.setdefault(page_id, {})[field] = len(words)
+        self._terms.setdefault(page_id, []).extend(
+            (field, word) for word in positions)
+
+    def _remove(self, page_id):
+        """Remove a page from the index."""
+        for field, word in self._terms.pop(page_id, ()):
+            pages = self._postings[field][word]
+            pages.pop(page_id, None)
+            if not pages:
+                del self._postings[field][word]
+        self._lengths.pop(page_id, None)
+        self._hashes.pop(page_id, None)
+
+    def _index_page(self, page_id, text, fields):
+        """Replace the indexed text and struct fields of a page."""
+        self._remove(page_id)
+        if not text:
+            # DokuWiki returns an empty text for deleted pages.
+            return
+        data = text.encode('utf-8')
+        self._hashes[page_id] = hashlib.md5(data).hexdigest()
+        self._add(page_id, 'text', text)
+        for field, value in fields.get(page_id, {}).items():
+            self._add(page_id, field, value)
+
+    def _struct_fields(self, page_ids):
+        """Return {page_id: {field: text}} of the struct data of pages."""
+        fields = {}
+        for schema in self._schemas:
+            columns = self._client._struct_columns(schema)
+            for row in self._client._struct_rows(schema, columns, page_ids,
+                                                 self._workers):
+                page_fields = fields.setdefault(row[0], {})
+                for column, value in zip(columns, row[1:]):
+                    if isinstance(value, list):
+                        value = ' '.join('%s' % item for item in value)
+                    if value is not None:
+                        page_fields['%s.%s' % (schema, column)] = '%s' % value
+        return fields
+
+    def _fetch(self, page_ids):
+        """Fetch and index the text and struct data of pages."""
+        def fetch(chunk):
+            return self._client.pages(chunk, len(chunk))
+        fields = self._struct_fields(page_ids) if self._schemas else {}
+        chunks = _chunks(page_ids, self._chunk_size)
+        for chunk, texts in _parallel_map(fetch, chunks, self._workers):
+            if isinstance(texts, DokuWikiError):
+                raise texts
+            for page_id, text in zip(chunk, texts):
+                if isinstance(text, DokuWikiError):
+                    self.errors[page_id] = text
+                    continue
+                self.errors.pop(page_id, None)
+                self._index_page(page_id, text, fields)
+
+    def build(self):
+        """Index the pages of the remote Wiki changed since indexed."""
+        listing = self._client.pagelist('', {'depth': 0, 'hash': True,
+                                             'skipacl': False})
+        remote = set(item['id'] for item in listing)
+        for page_id in set(self._lengths) - remote:
+            self._remove(page_id)
+        self._fetch(sorted(item['id'] for item in listing
+                           if not item.get('hash') or
+                           self._hashes.get(item['id']) != item['hash'] or
+                           item['id'] in self.errors))
+        self.timestamp = max([_revision(item) for item in listing] or [0])
+
+    def index_mirror(self, mirror):
+        """Index the pages of a DokuWikiMirror changed since indexed.
+
+        Only the struct data of the changed pages is fetched from the remote
+        Wiki.
+        """
+        page_ids = mirror.page_ids()
+        for page_id in set(self._lengths) - set(page_ids):
+            self._remove(page_id)
+        texts = {}
+        for page_id in page_ids:
+            text = mirror.read_page(page_id)
+            data = text.encode('utf-8')
+            if self._hashes.get(page_id) != hashlib.md5(data).hexdigest():
+                texts[page_id] = text
+        changed = sorted(texts)
+        fields = self._struct_fields(changed) if self._schemas else {}
+        for page_id in changed:
+            self._index_page(page_id, texts[page_id], fields)
+        self.timestamp = max(self.timestamp, mirror.timestamp)
+
+    def update(self):
+        """Reindex the pages changed since the last build or update."""
+        self._update(self._fetch)
+
+    def _matches(self, field, words):
+        """Return {page_id: count} of the occurrences of a phrase."""
+        postings = self._postings.get(field, {})
+        pages = [postings.get(word) for word in words]
+        if not all(pages):
+            return {}
+        if len(words) == 1:
+            return dict((page_id, len(positions))
+                        for page_id, positions in pages[0].items())
+        matches = {}
+        for page_id in set(pages[0]).intersection(*pages[1:]):
+            following = [set(word_pages[page_id])
+                         for word_pages in pages[1:]]
+            count = sum(1 for start in pages[0][page_id]
+                        if all(start + offset in positions
+                               for offset, positions
+                               in enumerate(following, 1)))
+            if count:
+                matches[page_id] = count
+        return matches
+
+    def search(self, query, limit=10):
+        """Return [(page_id, score)] of the pages matching query, best first.
+
+        query consists of words and "quoted phrases", each of which a page
+        must contain. They match the page text unless prefixed with the name
+        of another field, e.g. 'backup "full export" project.status:open'.
+        Other prefixes are part of the words, so 'wiki:syntax' matches the
+        phrase "wiki syntax" in the page text.
+        Pages are ranked by tf-idf: the sum over the query parts of
+        (1 + log(occurrences)) * log(1 + pages / matching pages). Return at
+        most limit results, or all if limit is None.
+        """
+        scores = None
+        for field, phrase, word in _QUERY_PART.findall(query):
+            words = _words(phrase or word)
+            if field and field != 'text' and field not in self._postings:
+                words = _words(field) + words
+                field = None
+            if not words:
+                continue
+            matches = self._matches(field or 'text', words)
+            idf = math.log(1.0 + len(self._lengths) / float(len(matches) or 1))
+            part = dict((page_id, (1 + math.log(count)) * idf)
+                        for page_id, count in matches.items())
+            if scores is not None:
+                part = dict((page_id, score + part[page_id])
+                            for page_id, score in scores.items()
+                            if page_id in part)
+            scores = part
+        ranked = sorted((scores or {}).items(),
+                        key=lambda item: (-item[1], item[0]))
+        return ranked if limit is None else ranked[:limit]
+
+    def save(self, path):
+        """Write the index to the JSON file path."""
+        postings = dict((field, dict(
+            (word, dict((page_id, list(positions))
+                        for page_id, positions in pages.items()))
+            for word, pages in words.items()))
+            for field, words in self._postings.items())
+        state = {'timestamp': self.timestamp, 'hashes': self._hashes,
+                 'lengths': self._lengths, 'postings': postings}
+        _write_file(path, json.dumps(state).encode('utf-8'))
+
+    def load(self, path):
+        """Replace the index with the one saved in the JSON file path."""
+        with open(path, 'rb') as index_file:
+            state = json.loads(index_file.read().decode('utf-8'))
+        self.timestamp = state['timestamp']
+        self._hashes = state['hashes']
+        self._lengths = state['lengths']
+        self._postings = {}
+        self._terms = {}
+        for field, words in state['postings'].items():
+            postings = self._postings[field] = {}
+            for word, pages in words.items():
+                postings[word] = dict((page_id, array('i', positions))
+                                      for page_id, positions in pages.items())
+                for page_id in pages:
+                    self._terms.setdefault(page_id, []).append((field, word))
+
+
+def _reverse_delta(newer, older):
+    """Return the line changes turning the lines newer into older.
+
+    The delta is a tuple of (start, end, lines) replacing newer[start:end].
+    """
+    matcher = difflib.SequenceMatcher(None, newer, older)
+    return tuple((start, end, tuple(older[older_start:older_end]))
+                 for tag, start, end, older_start, older_end
+                 in matcher.get_opcodes() if tag != 'equal')
+
+
+def _apply_delta(lines, delta):
+    """Apply a delta returned by _reverse_delta() to lines."""
+    result = []
+    position = 0
+    for start, end, replacement in delta:
+        result.extend(lines[position:start])
+        result.extend(replacement)
+        position = end
+    result.extend(lines[position:])
+    return result
+
+
+class PageHistory(_ChangeTracker):
+    """Local store of the revision history of Wiki pages.
+
+    fetch() lists the versions of pages, following the page_versions()
+    pagination, and fetches the text of every revision not stored yet with
+    batched getPageVersion calls, several pages in parallel. Only the newest
+    text of a page is stored in full, every older revision is stored as the
+    line changes turning the next newer revision into it. Any revision can be
+    rebuilt with text() and any two revisions compared with diff() without
+    fetching them again. update() fetches the revisions of the stored pages
+    changed since the last fetch or update.
+    """
+
+    def __init__(self, client, workers=4, chunk_size=None):
+        """Create an empty history store for the Wiki of client."""
+        _ChangeTracker.__init__(self, client, workers, chunk_size)
+        self._pages = {}
+
+    def _fetch_page(self, page_id):
+        """Return (current revision, {revision: text}) of missing revisions.
+
+        The current revision is None if the page does not exist anymore.
+        """
+        stored = self._pages.get(page_id)
+        known = set(stored['revisions']) if stored else set()
+        info, text = self._client.multicall([('wiki.getPageInfo', (page_id,)),
+                                             ('wiki.getPage', (page_id,))])
+        texts = {}
+        current = None
+        if not isinstance(info, DokuWikiError):
+            current = info.get('version') or _timestamp(
+                info.get('lastModified'))
+            if current not in known:
+                texts[current] = text
+                known.add(current)
+        missing = [version['version'] for version in
+                   self._client.iter_page_versions(page_id)
+                   if version['version'] not in known]
+        texts.update(zip(missing, self._client.multicall(
+            [('wiki.getPageVersion', (page_id, revision))
+             for revision in missing], self._chunk_size)))
+        return current, texts
+
+    def _store(self, page_id, texts):
+        """Merge fetched revision texts into the history of a page."""
+        stored = self._pages.get(page_id)
+        failed = [revision for revision, text in texts.items()
+                  if isinstance(text, DokuWikiError)]
+        for revision in failed:
+            self.errors[page_id] = texts.pop(revision)
+        if not failed:
+            self.errors.pop(page_id, None)
+        if not texts:
+            return
+        kept = ()
+        if stored:
+            newest = stored['revisions'][0]
+            if min(texts) > newest:
+                # Only newer revisions: rebuild the newest one and keep the
+                # deltas of the older ones.
+                texts[newest] = ''.join(stored['lines'])
+                kept = stored['deltas']
+            else:
+                lines = list(stored['lines'])
+                deltas = chain([()], stored['deltas'])
+                for revision, delta in zip(stored['revisions'], deltas):
+                    lines = _apply_delta(lines, delta)
+                    texts[revision] = ''.join(lines)
+        revisions = sorted(texts, reverse=True)
+        lines = [texts[revision].splitlines(True) for revision in revisions]
+        deltas = tuple(_reverse_delta(newer, older)
+                       for newer, older in zip(lines, lines[1:]))
+        if kept:
+            revisions.extend(stored['revisions'][1:])
+        self._pages[page_id] = {'revisions': revisions,
+                                'lines': tuple(lines[0]),
+                                'deltas': deltas + kept}
+
+    def fetch(self, page_ids):
+        """Fetch the revisions of pages that are not stored yet."""
+        for page_id, result in _parallel_map(self._fetch_page, page_ids,
+                                             self._workers):
+            if isinstance(result, DokuWikiError):
+                self.errors[page_id] = result
+                continue
+            current, texts = result
+            self._store(page_id, texts)
+            if current:
+                self.timestamp = max(self.timestamp, current)
+
+    def update(self):
+        """Fetch the revisions of stored pages changed since the last fetch."""
+        self._update(self.fetch, self._pages.__contains__)
+
+    def pages(self):
+        """Return the ids of the stored pages."""
+        return sorted(self._pages)
+
+    def revisions(self, page_id):
+        """Return the stored revisions of a page, newest first."""
+        return list(self._pages[page_id]['revisions'])
+
+    def _lines(self, page_id, revision=None):
+        """Return the lines of a revision of a page (default: newest)."""
+        stored = self._pages[page_id]
+        lines = list(stored['lines'])
+        if revision is None:
+            return lines
+        try:
+            index = stored['revisions'].index(revision)
+        except ValueError:
+            raise KeyError('%s has no revision %s' % (page_id, revision))
+        for delta in stored['deltas'][:index]:
+            lines = _apply_delta(lines, delta)
+        return lines
+
+    def text(self, page_id, revision=None):
+        """Return the raw Wiki text of a revision of a page.
+
+        revision defaults to the newest stored revision. A KeyError is raised
+        for pages and revisions that are not stored.
+        """
+        return ''.join(self._lines(page_id, revision))
+
+    def diff(self, page_id, old, new=None, context=3):
+        """Return a unified diff between two revisions of a page.
+
+        new defaults to the newest stored revision.
+        """
+        new = new or self._pages[page_id]['revisions'][0]
+        return ''.join(difflib.unified_diff(
+            self._lines(page_id, old), self._lines(page_id, new),
+            '%s@%s' % (page_id, old), '%s@%s' % (page_id, new), n=context))
+
+
+EditResult = namedtuple('EditResult', 'page_id status error')
+EditResult.__doc__ = """Outcome of a BulkEditor edit."""
+
+
+def _version_matches(info, expected):
+    """Check whether page_info() describes the expected page version."""
+    if isinstance(info, DokuWikiError):
+        return not expected
+    last_modified = info.get('lastModified')
+    return expected in (info.get('version'), last_modified,
+                        _timestamp(last_modified))
+
+
+class BulkEditor(object):
+    """Apply many page edits while holding DokuWiki page locks.
+
+    Edits are processed in batches of batch_size pages: the pages of a batch
+    are locked with a single set_locks() call, the current version of every
+    locked page is compared with the version the edit is based on, the pages
+    are written by up to workers concurrent put_page() calls, and the locks
+    are released with a single set_locks() call.
+    """
+
+    def __init__(self, client, workers=4, batch_size=100, summary='',
+                 minor=False):
+        """Create a bulk editor for the Wiki of client."""
+        self._client = client
+        self._workers = workers
+        self._batch_size = batch_size
+        self._summary = summary
+        self._minor = minor
+
+    def edit(self, edits):
+        """Apply edits and yield an EditResult per page.
+
+        edits is an iterable of (page_id, text) or (page_id, text, expected)
+        tuples, where expected is the 'version' or 'lastModified' reported by
+        page_info() for the version the new text is based on (0 for a new
+        page). A page whose current version differs is not written. The
+        status of an EditResult is 'saved', 'locked' if somebody else holds
+        the lock of the page, 'conflict' if the page changed or 'error' if
+        the write failed, in which case error holds the DokuWikiError.
+        """
+        for batch in _chunks(edits, self._batch_size):
+            for result in self._edit_batch(batch):
+                yield result
+
+    def _edit_batch(self, batch):
+        """Lock, check, write and unlock a batch of edits."""
+        page_ids = [edit[0] for edit in batch]
+        locks = self._client.set_locks({'lock': page_ids, 'unlock': []})
+        lockfail = set(locks.get('lockfail', []))
+        locked = [page_id for page_id in page_ids if page_id not in lockfail]
+        results = []
+        try:
+            checked = [edit for edit in batch if edit[0] not in lockfail and
+                       len(edit) > 2 and edit[2] is not None]
+            infos = self._client.page_infos([edit[0] for edit in checked])
+            conflicts = set(edit[0] for edit, info in zip(checked, infos)
+                            if not _version_matches(info, edit[2]))
+            writes = []
+            for edit in batch:
+                if edit[0] in lockfail:
+                    results.append(EditResult(edit[0], 'locked', None))
+                elif edit[0] in conflicts:
+                    results.append(EditResult(edit[0], 'conflict', None))
+                else:
+                    writes.append((edit[0], edit[1], self._summary,
+                                   self._minor))
+            for page_id, error in self._client.put_pages(
+                    writes, self._workers, ordered=False):
+                if isinstance(error, DokuWikiError):
+                    results.append(EditResult(page_id, 'error', error))
+                else:
+                    results.append(EditResult(page_id, 'saved', None))
+        finally:
+            if locked:
+                self._client.set_locks({'lock': [], 'unlock': locked})
+        return results
+
+
+class AsyncDokuWikiClient(object):
+    """asyncio DokuWiki XML-RPC client.
+
+    This class offers the methods of DokuWikiClient as awaitables, e.g.
+    ``await client.page('start')``. The calls run on a pool of concurrency
+    worker threads sharing the keep-alive connection pool of a single
+    DokuWikiClient, so at most concurrency requests are in flight at once and
+    the event loop is never blocked. Errors are raised exactly as by
+    DokuWikiClient. Requires Python 3.
+    """
+
+    def __init__(self, url, user, passwd, concurrency=10, **kwargs):
+        """Create asyncio DokuWiki XMLRPC client.
+
+        All keyword arguments except concurrency are passed on to
+        DokuWikiClient. The client is lazy by default, so creating it does not
+        block the event loop.
+        """
+        if asyncio is None or ThreadPoolExecutor is None:
+            raise DokuWikiError('AsyncDokuWikiClient requires asyncio.')
+        kwargs.setdefault('pool_size', concurrency)
+        kwargs.setdefault('lazy', True)
+        self._client = DokuWikiClient(url, user, passwd, **kwargs)
+        self._executor = ThreadPoolExecutor(concurrency)
+
+    def _run(self, func, *args, **kwargs):
+        """Run func in the worker pool and return an asyncio future."""
+        loop = asyncio.get_event_loop()
+        return loop.run_in_executor(self._executor,
+                                    partial(func, *args, **kwargs))
+
+    @property
+    def dokuwiki_version(self):
+        """DokuWiki version reported by the remote Wiki (awaitable)."""
+        return self._run(getattr, self._client, 'dokuwiki_version')
+
+    def close(self):
+        """Shut down the worker pool and close the pooled connections."""
+        self._executor.shutdown(wait=False)
+        self._client.close()
+
+
+def _async_method(name):
+    """Return an AsyncDokuWikiClient method wrapping DokuWikiClient.name."""
+    def method(self, *args, **kwargs):
+        return self._run(getattr(self._client, name), *args, **kwargs)
+    method.__name__ = name
+    method.__doc__ = getattr(DokuWikiClient, name).__doc__
+    return method
+
+
+for _name in ('ping', 'rpc_version_supported', 'page', 'page_versions',
+              'page_info', 'page_html', 'multicall', 'pages', 'page_infos',
+              'page_htmls', 'put_page', 'append_page', 'pagelist',
+              'all_pages', 'backlinks', 'links', 'recent_changes',
+              'recent_media_changes', 'acl_check', 'get_file', 'put_file',
+              'download_file', 'upload_file', 'delete_file', 'file_info',
+              'list_files', 'set_locks', 'struct_getdata', 'struct_savedata',
+              'struct_getschema', 'struct_getaggregationdata'):
+    setattr(AsyncDokuWikiClient, _name, _async_method(_name))
+del _name
+
 
 class Callback(object):
     """Callback class used by the option parser.
@@ -358,42 +3099,100 @@ class Callback(object):
     the specified callback. The callback is specified in the option parser. The
     option destination has to match a DokuWikiClient method.
 
+    The client is created once per parser and reused by all callbacks. Page
+    options accept many page ids (and --stdin reads more from the standard
+    input), which are fetched with system.multicall or on a pool of threads
+    and output as they arrive, as JSON lines if --jsonl is given. Like
+    --time, the options --stdin, --jsonl, --workers and --chunk-size have to
+    precede the option they apply to.
+
     """
+    # Page options that are fetched in system.multicall batches
+    MULTICALL = {'page': 'pages', 'page_html': 'page_htmls',
+                 'page_info': 'page_infos'}
+
     def __init__(self, option, opt_str, value, parser):
         """Initalize callback object."""
         if parser.values.user and parser.values.wiki and parser.values.passwd:
             try:
-                self.dokuwiki = DokuWikiClient(parser.values.wiki,
-                                               parser.values.user,
-                                               parser.values.passwd,
-                                               parser.values.http_basic_auth)
+                self.dokuwiki = getattr(parser, '_dokuwiki', None)
+                if self.dokuwiki is None:
+                    self.dokuwiki = DokuWikiClient(
+                        parser.values.wiki, parser.values.user,
+                        parser.values.passwd, parser.values.http_basic_auth,
+                        chunk_size=parser.values.chunk_size,
+                        pool_size=parser.values.workers, lazy=True)
+                    parser._dokuwiki = self.dokuwiki
 
                 self._parser = parser
                 (data, output_format) = self.dispatch(option.dest, value)
+                if output_format == 'bulk':
+                    data = self._output_bulk(data)
             except DokuWikiError as error:
                 parser.error(str(error))
 
-            if data:
-                if output_format == 'plain':
-                    print(data)
-
-                elif output_format == 'list':
-                    for item in data:
-                        print(item)
-
-                elif output_format == 'dict':
-                    if isinstance(data, list):
-                        for item in data:
-                            for key in item.keys():
-                                print('%s: %s' % (key, item[key]))
-                            print("\n")
-                    else:
-                        for key in data.keys():
-                            print('%s: %s' % (key, data[key]))
+            if output_format == 'bulk':
+                if data:
+                    parser.exit(1)
+            elif parser.values.jsonl:
+                # Lists are streamed with one line per item
+                for item in (data if isinstance(data, list) else [data]):
+                    self._output_jsonl(None, item)
+            elif data:
+                self._output(data, output_format)
 
         else:
             parser.print_usage()
 
+    def _output(self, data, output_format):
+        """Print the data of a callback in the given format."""
+        if output_format == 'plain':
+            print(data)
+
+        elif output_format == 'list':
+            for item in data:
+                print(item)
+
+        elif output_format == 'dict':
+            if isinstance(data, list):
+                for item in data:
+                    for key in item.keys():
+                        print('%s: %s' % (key, item[key]))
+                    print("\n")
+            else:
+                for key in data.keys():
+                    print('%s: %s' % (key, data[key]))
+
+    def _output_jsonl(self, page_id, data):
+        """Write the result of a callback as a single line of JSON."""
+        record = {}
+        if page_id is not None:
+            record['id'] = page_id
+        if isinstance(data, DokuWikiError):
+            record['error'] = str(data)
+        else:
+            record['result'] = data
+        sys.stdout.write(json.dumps(record, default=str) + '\n')
+
+    def _output_bulk(self, results):
+        """Output (page_id, data, output_format) triples as they arrive.
+
+        Return True if any of the pages failed.
+        """
+        jsonl = self._parser.values.jsonl
+        failed = False
+        for page_id, data, output_format in results:
+            if jsonl:
+                self._output_jsonl(page_id, data)
+            elif isinstance(data, DokuWikiError):
+                sys.stderr.write('%s: %s\n' % (page_id, data))
+            else:
+                print('==> %s <==' % page_id)
+                self._output(data, output_format)
+            failed = failed or isinstance(data, DokuWikiError)
+            sys.stdout.flush()
+        return failed
+
     def _get_page_id(self):
         """Check if the additional arguments contain a Wiki page id."""
         try:
@@ -401,32 +3200,83 @@ class Callback(object):
         except IndexError:
             self._parser.error('You have to specify a Wiki page.')
 
+    def _get_page_ids(self):
+        """Return the Wiki page ids following the option and on stdin.
+
+        With --stdin an iterator is returned which reads the standard input
+        line by line while the pages are fetched, so the first pages are
+        output before the input ends. Falls back to _get_page_id() if
+        neither is given.
+        """
+        rargs = self._parser.rargs
+        page_ids = []
+        while rargs and not rargs[0].startswith('-'):
+            page_ids.append(rargs.pop(0))
+        if self._parser.values.stdin:
+            lines = (line.strip() for line in iter(sys.stdin.readline, ''))
+            return chain(page_ids, (line for line in lines if line))
+        if not page_ids:
+            page_ids.append(self._get_page_id())
+        return page_ids
+
+    def _is_bulk(self, page_ids):
+        """Return True if the page ids are output per page."""
+        values = self._parser.values
+        return values.stdin or values.jsonl or len(page_ids) > 1
+
+    def _bulk(self, option, page_ids, callback, output_format):
+        """Yield (page_id, data, output_format) triples for many pages.
+
+        Pages are fetched in system.multicall batches if the option supports
+        it, otherwise by calling callback on a pool of threads. page_ids may
+        be an iterator; a batch is sent once chunk_size ids were read.
+        """
+        # Fail once for an unreachable Wiki instead of once per page
+        self.dokuwiki.ping()
+        workers = self._parser.values.workers
+        method = self.MULTICALL.get(option)
+        if method is not None and not self._parser.values.timestamp:
+            batches = _chunks(page_ids, self._parser.values.chunk_size)
+            method = getattr(self.dokuwiki, method)
+            for batch, results in _parallel_map(method, batches, workers,
+                                                True):
+                if isinstance(results, DokuWikiError):
+                    results = [results] * len(batch)
+                for page_id, data in zip(batch, results):
+                    yield page_id, data, output_format
+        else:
+            for page_id, data in self.dokuwiki.map_pages(page_ids, callback,
+                                                         workers):
+                yield page_id, data, output_format
+
     def dispatch(self, option, value):
         """Dispatch the provided callback."""
 
         callback = self.dokuwiki.__getattribute__(option)
 
         if option == 'page' or option == 'page_html':
-            page_id = self._get_page_id()
+            page_ids = self._get_page_ids()
 
             timestamp = self._parser.values.timestamp
+            if timestamp:
+                callback = partial(callback, revision=timestamp)
 
-            if not timestamp:
-                return (callback(page_id), 'plain')
-            else:
-                return (callback(page_id, timestamp), 'plain')
+            if self._is_bulk(page_ids):
+                return (self._bulk(option, page_ids, callback, 'plain'),
+                        'bulk')
+            return (callback(page_ids[0]), 'plain')
 
         elif option == 'append_page':
             page_id = self._get_page_id()
             return (callback(page_id, value), 'dict')
 
-        elif option == 'backlinks':
-            page_id = self._get_page_id()
-            return (callback(page_id), 'list')
-
-        elif option == 'page_info' or option == 'page_versions' or option == 'links':
-            page_id = self._get_page_id()
-            return (callback(page_id), 'dict')
+        elif option in ('backlinks', 'page_info', 'page_versions', 'links'):
+            page_ids = self._get_page_ids()
+            output_format = 'list' if option == 'backlinks' else 'dict'
+            if self._is_bulk(page_ids):
+                return (self._bulk(option, page_ids, callback,
+                                   output_format), 'bulk')
+            return (callback(page_ids[0]), output_format)
 
         elif option == 'all_pages':
             return (callback(), 'list')
@@ -531,6 +3381,31 @@ def main():
                       type='string',
                       help='Append the given text to the wiki page.')
 
+    parser.add_option('--stdin',
+                      dest='stdin',
+                      action='store_true',
+                      help='Read additional page ids from standard input, '
+                      'one per line.',
+                      default=False)
+
+    parser.add_option('--jsonl',
+                      dest='jsonl',
+                      action='store_true',
+                      help='Output one JSON object per line.',
+                      default=False)
+
+    parser.add_option('--workers',
+                      dest='workers',
+                      type='int',
+                      help='Number of concurrent requests for many pages.',
+                      default=4)
+
+    parser.add_option('--chunk-size',
+                      dest='chunk_size',
+                      type='int',
+                      help='Number of pages fetched per multicall request.',
+                      default=50)
+
     parser.parse_args()
 
 
@@ -0,0 +1,42 @@
+# -*- coding: UTF-8 -*-
+
+"""Fixtures serving the fake Wiki of the benchmarks to the tests."""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import benchmark  # noqa: E402
+import dokuwikixmlrpc  # noqa: E402
+
+# The asyncio tests use async def.
+collect_ignore = ['test_async.py'] if sys.version_info < (3, 5) else []
+
+
+@pytest.fixture
+def wiki():
+    """A small fake Wiki."""
+    return benchmark.FakeWiki(pages=20, page_size=256, file_size=300000)
+
+
+@pytest.fixture
+def server(wiki):
+    """A server for the fake Wiki running in a background thread."""
+    server = benchmark.serve(wiki)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(server):
+    """A client of the fake Wiki."""
+    client = dokuwikixmlrpc.DokuWikiClient(
+        'http://%s:%d' % server.server_address, 'user', 'passwd')
+    yield client
+    client.close()
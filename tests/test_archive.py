@@ -0,0 +1,84 @@
+# -*- coding: UTF-8 -*-
+
+"""Tests of export_wiki() and import_wiki()."""
+
+import zipfile
+
+import pytest
+
+import benchmark
+from dokuwikixmlrpc import xmlrpclib
+
+
+class HistoryWiki(benchmark.FakeWiki):
+    """Fake Wiki keeping the revisions of its pages."""
+
+    def __init__(self, **kwargs):
+        benchmark.FakeWiki.__init__(self, **kwargs)
+        self.history = {}
+        for page_id, text in self.pages.items():
+            self.history[page_id] = {10: 'first', 20: 'second', 30: text}
+
+    def wiki_putPage(self, page_id, text, params):
+        revisions = self.history.setdefault(page_id, {})
+        revisions[max(revisions or [0]) + 10] = text
+        return benchmark.FakeWiki.wiki_putPage(self, page_id, text, params)
+
+    def wiki_getPageInfo(self, page_id):
+        info = benchmark.FakeWiki.wiki_getPageInfo(self, page_id)
+        info['version'] = max(self.history[page_id])
+        return info
+
+    def wiki_getPageVersions(self, page_id, offset):
+        # Like DokuWiki: newest first, including the current revision.
+        revisions = sorted(self.history.get(page_id, {}), reverse=True)
+        return [{'version': revision, 'user': 'bench',
+                 'lastModified': xmlrpclib.DateTime(revision)}
+                for revision in revisions[offset:] or revisions]
+
+    def wiki_getPageVersion(self, page_id, revision):
+        if self.history[page_id][revision] is None:
+            raise xmlrpclib.Fault(1, 'Missing revision')
+        return self.history[page_id][revision]
+
+
+@pytest.fixture
+def wiki():
+    wiki = HistoryWiki(pages=5, page_size=64, file_size=100000)
+    for index in range(10):
+        wiki.files['media:file%d.bin' % index] = b'%d' % index * 1000
+    return wiki
+
+
+def test_export_import_round_trip(client, wiki, tmpdir):
+    path = str(tmpdir.join('wiki.zip'))
+    result = client.export_wiki(path, history=True)
+    assert result == {'pages': 6, 'media': 11, 'errors': {}}
+    with zipfile.ZipFile(path) as archive:
+        for file_id, data in wiki.files.items():
+            assert archive.read('media/' + file_id.replace(':', '/')) == data
+        # The current revision is stored as the page only.
+        assert sorted(name for name in archive.namelist()
+                      if name.startswith('attic/start.')) == \
+            ['attic/start.10.txt', 'attic/start.20.txt']
+    exported = dict(wiki.pages)
+    media = dict(wiki.files)
+    wiki.files.clear()
+    result = client.import_wiki(path, history=True)
+    assert result == {'pages': 6, 'media': 11, 'errors': {}}
+    assert wiki.pages == exported
+    assert wiki.files == media
+    # Each page got its two old revisions and its text once more.
+    assert [wiki.history['start'][revision] for revision in
+            sorted(wiki.history['start'])][3:] == \
+        ['first', 'second', exported['start']]
+
+
+def test_missing_revisions_are_errors(client, wiki, tmpdir):
+    path = str(tmpdir.join('wiki.zip'))
+    wiki.history['start'][20] = None
+    result = client.export_wiki(path, history=True, media=False)
+    assert list(result['errors']) == ['start@20']
+    with zipfile.ZipFile(path) as archive:
+        assert 'attic/start.10.txt' in archive.namelist()
+        assert 'attic/start.20.txt' not in archive.namelist()
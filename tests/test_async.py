@@ -0,0 +1,96 @@
+# -*- coding: UTF-8 -*-
+
+"""Tests of AsyncDokuWikiClient."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+import benchmark
+import dokuwikixmlrpc
+
+
+class CountingWiki(benchmark.FakeWiki):
+    """Fake Wiki recording the largest number of concurrent getPage
+    calls."""
+
+    def __init__(self, **kwargs):
+        benchmark.FakeWiki.__init__(self, **kwargs)
+        self._lock = threading.Lock()
+        self.active = self.peak = 0
+
+    def wiki_getPage(self, page_id):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.05)
+        with self._lock:
+            self.active -= 1
+        return benchmark.FakeWiki.wiki_getPage(self, page_id)
+
+
+@pytest.fixture
+def wiki():
+    return CountingWiki(pages=20, page_size=64, file_size=10)
+
+
+def _run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def _client(server, **kwargs):
+    return dokuwikixmlrpc.AsyncDokuWikiClient(
+        'http://%s:%d' % server.server_address, 'user', 'passwd', **kwargs)
+
+
+def test_calls(server, wiki):
+    client = _client(server)
+
+    async def calls():
+        version = await client.rpc_version_supported()
+        text = await client.page('start')
+        return version, text
+    assert _run(calls()) == (2, wiki.pages['start'])
+    client.close()
+
+
+def test_concurrency_is_bounded(server, wiki):
+    client = _client(server, concurrency=3)
+    page_ids = sorted(wiki.pages)
+
+    async def fetch():
+        return await asyncio.gather(*[client.page(page_id)
+                                      for page_id in page_ids])
+    assert _run(fetch()) == [wiki.pages[page_id] for page_id in page_ids]
+    assert 1 < wiki.peak <= 3
+    client.close()
+
+
+def test_errors(server, wiki):
+    client = _client(server)
+
+    async def missing():
+        await client.page_info('missing')
+    with pytest.raises(dokuwikixmlrpc.DokuWikiXMLRPCError) as error:
+        _run(missing())
+    assert error.value.page_id == 121
+    client.close()
+
+
+def test_unreachable(server, monkeypatch):
+    monkeypatch.setattr(dokuwikixmlrpc, '_PING_CACHE', {})
+    server.shutdown()
+    server.server_close()
+    client = _client(server)
+
+    async def ping():
+        await client.ping()
+    with pytest.raises(dokuwikixmlrpc.DokuWikiURLError):
+        _run(ping())
+    client.close()
@@ -0,0 +1,83 @@
+# -*- coding: UTF-8 -*-
+
+"""Tests of BulkEditor."""
+
+import time
+
+import pytest
+
+import dokuwikixmlrpc
+from dokuwikixmlrpc import xmlrpclib
+
+
+def _date(timestamp):
+    return xmlrpclib.DateTime(time.gmtime(timestamp))
+
+
+def _edit(client, edits, batch_size=100):
+    editor = dokuwikixmlrpc.BulkEditor(client, batch_size=batch_size)
+    return dict((result.page_id, result) for result in editor.edit(edits))
+
+
+def test_saved(wiki, client):
+    results = _edit(client, [('start', 'one'),
+                             ('ns1:page1', 'two', wiki.created)],
+                    batch_size=1)
+    assert [result.status for result in results.values()] == ['saved'] * 2
+    assert wiki.pages['start'] == 'one'
+    assert wiki.pages['ns1:page1'] == 'two'
+    assert wiki.locks == set()
+
+
+def test_locked(wiki, client):
+    wiki.foreign_locks.add('start')
+    results = _edit(client, [('start', 'mine'), ('ns1:page1', 'two')])
+    assert results['start'].status == 'locked'
+    assert results['ns1:page1'].status == 'saved'
+    assert wiki.pages['start'] != 'mine'
+    assert wiki.locks == set()
+
+
+def test_conflicts(wiki, client):
+    wiki.wiki_putPage('start', 'edited by somebody else', {})
+    current = wiki.revisions['start']
+    results = _edit(client, [
+        ('start', 'stale', current - 1),
+        ('ns1:page1', 'stale', _date(wiki.created - 1)),
+        ('ns2:page2', 'by version', wiki.created),
+        ('ns3:page3', 'by date', _date(wiki.created))])
+    assert results['start'].status == 'conflict'
+    assert results['ns1:page1'].status == 'conflict'
+    assert wiki.pages['start'] == 'edited by somebody else'
+    for page_id in ('ns2:page2', 'ns3:page3'):
+        assert results[page_id].status == 'saved'
+    assert wiki.locks == set()
+
+
+def test_new_pages(wiki, client):
+    results = _edit(client, [('new:page', 'new', 0), ('start', 'new', 0)])
+    assert results['new:page'].status == 'saved'
+    assert wiki.pages['new:page'] == 'new'
+    # The page exists already.
+    assert results['start'].status == 'conflict'
+
+
+def test_write_errors(wiki, client, monkeypatch):
+    def put_page(page_id, *args):
+        raise dokuwikixmlrpc.DokuWikiXMLRPCError(xmlrpclib.Fault(1, 'no'))
+    monkeypatch.setattr(client, 'put_page', put_page)
+    results = _edit(client, [('start', 'text')])
+    assert results['start'].status == 'error'
+    assert results['start'].error.message == 'no'
+    assert wiki.locks == set()
+
+
+@pytest.mark.parametrize('method', ['page_infos', 'put_pages'])
+def test_locks_are_released(wiki, client, monkeypatch, method):
+    def fail(*args, **kwargs):
+        raise dokuwikixmlrpc.DokuWikiConnectionError(IOError('timed out'))
+    monkeypatch.setattr(client, method, fail)
+    with pytest.raises(dokuwikixmlrpc.DokuWikiConnectionError):
+        _edit(client, [('start', 'text', wiki.created), ('ns1:page1', 'text')])
+    assert wiki.locks == set()
+    assert wiki.pages['start'] != 'text'
@@ -0,0 +1,126 @@
+# -*- coding: UTF-8 -*-
+
+"""Tests of the response cache."""
+
+import pytest
+
+import benchmark
+import dokuwikixmlrpc
+from dokuwikixmlrpc import xmlrpclib
+
+
+class RevisionWiki(benchmark.FakeWiki):
+    """Fake Wiki serving old revisions, where only the user set as user
+    may read the page 'private'."""
+
+    def wiki_getPageVersion(self, page_id, revision):
+        return 'revision %d of %s' % (revision, page_id)
+
+    def wiki_getPage(self, page_id):
+        if page_id == 'private' and self.user != 'admin':
+            raise xmlrpclib.Fault(111, 'Forbidden')
+        return benchmark.FakeWiki.wiki_getPage(self, page_id)
+
+
+@pytest.fixture
+def wiki():
+    wiki = RevisionWiki(pages=5, page_size=64, file_size=10)
+    wiki.pages['private'] = 'secret'
+    wiki.user = 'admin'
+    return wiki
+
+
+def _client(server, cache, user='user'):
+    return dokuwikixmlrpc.DokuWikiClient(
+        'http://%s:%d' % server.server_address, user, 'passwd', cache=cache)
+
+
+def test_hits(server, wiki):
+    cache = dokuwikixmlrpc.DokuWikiCache()
+    client = _client(server, cache)
+    calls = []
+    client._transport.add_hook(post=lambda event: calls.append(
+        event['method']))
+    assert client.page('start') == wiki.pages['start']
+    assert client.page('start') == wiki.pages['start']
+    assert client.page('start', 5) == 'revision 5 of start'
+    assert client.page('start', 5) == 'revision 5 of start'
+    assert calls == ['system.multicall', 'wiki.getPageVersion']
+    client.close()
+
+
+def test_ttl_revalidation(server, wiki):
+    client = _client(server, dokuwikixmlrpc.DokuWikiCache(ttl=0))
+    calls = []
+    client._transport.add_hook(post=lambda event: calls.append(
+        event['method']))
+    assert client.page('start') == wiki.pages['start']
+    # Expired, but unchanged: only the page info is fetched.
+    assert client.page('start') == wiki.pages['start']
+    assert calls == ['system.multicall', 'wiki.getPageInfo']
+    wiki.wiki_putPage('start', 'changed', {})
+    assert client.page('start') == 'changed'
+    client.close()
+
+
+@pytest.mark.parametrize('method', ['put_page', 'append_page'])
+def test_writes_invalidate(server, wiki, method):
+    client = _client(server, dokuwikixmlrpc.DokuWikiCache())
+    client.page('start')
+    getattr(client, method)('start', 'new')
+    assert client.page('start').endswith('new')
+    client.close()
+
+
+def test_wikis_and_users_are_separate(server, wiki):
+    cache = dokuwikixmlrpc.DokuWikiCache()
+    other_wiki = RevisionWiki(pages=5, page_size=10, file_size=10)
+    other_wiki.pages['start'] = 'other Wiki'
+    other_server = benchmark.serve(other_wiki)
+    try:
+        admin = _client(server, cache, 'admin')
+        other = _client(other_server, cache, 'admin')
+        assert admin.page('start') == wiki.pages['start']
+        assert other.page('start') == 'other Wiki'
+        assert admin.page('private') == 'secret'
+        wiki.user = 'guest'
+        guest = _client(server, cache, 'guest')
+        with pytest.raises(dokuwikixmlrpc.DokuWikiXMLRPCError):
+            guest.page('private')
+        # Writes only invalidate the entries of their own Wiki.
+        other.put_page('start', 'changed')
+        assert admin.page('start') == wiki.pages['start']
+        for client in (admin, other, guest):
+            client.close()
+    finally:
+        other_server.shutdown()
+        other_server.server_close()
+
+
+def test_disk_tier(server, wiki, tmpdir):
+    path = str(tmpdir.join('cache'))
+    cache = dokuwikixmlrpc.DokuWikiCache(path=path)
+    client = _client(server, cache)
+    assert client.page('start', 5) == 'revision 5 of start'
+    client.page('start')
+    cache.close()
+    client.close()
+    cache = dokuwikixmlrpc.DokuWikiCache(path=path)
+    client = _client(server, cache)
+    calls = []
+    client._transport.add_hook(post=lambda event: calls.append(
+        event['method']))
+    assert client.page('start', 5) == 'revision 5 of start'
+    assert calls == []
+    # Mutable entries are only kept in memory.
+    client.page('start')
+    assert calls == ['system.multicall']
+    cache.close()
+    client.close()
+    # Another user does not get the stored revision.
+    cache = dokuwikixmlrpc.DokuWikiCache(path=path)
+    assert cache.get((client._url, 'guest', 'wiki.getPageVersion',
+                      'start', 5)) is None
+    assert cache.get((client._url, 'user', 'wiki.getPageVersion',
+                      'start', 5))[0] == 'revision 5 of start'
+    cache.close()
@@ -0,0 +1,87 @@
+# -*- coding: UTF-8 -*-
+
+"""Tests of the bulk mode of the command line client."""
+
+import io
+import json
+import sys
+
+import pytest
+
+import dokuwikixmlrpc
+
+
+def _main(monkeypatch, server, *args):
+    url = 'http://%s:%d' % server.server_address
+    monkeypatch.setattr(sys, 'argv', ['dokuwikixmlrpc', '-u', 'user',
+                                      '-w', url, '-p', 'passwd'] +
+                        list(args))
+    try:
+        dokuwikixmlrpc.main()
+    except SystemExit as exit:
+        return exit.code
+    return 0
+
+
+def test_several_pages(monkeypatch, server, wiki, capsys):
+    wiki.pages['start'] = 'first'
+    wiki.pages['ns1:page1'] = 'second'
+    assert _main(monkeypatch, server, '--raw', 'start', 'ns1:page1') == 0
+    assert capsys.readouterr().out == (
+        '==> start <==\nfirst\n==> ns1:page1 <==\nsecond\n')
+
+
+def test_jsonl(monkeypatch, server, wiki, capsys):
+    assert _main(monkeypatch, server, '--jsonl', '--info', 'start',
+                 'missing') == 1
+    records = [json.loads(line)
+               for line in capsys.readouterr().out.splitlines()]
+    assert records[0]['id'] == 'start'
+    assert records[0]['result']['name'] == 'start'
+    assert records[1]['id'] == 'missing'
+    assert 'error' in records[1]
+
+
+def test_failures_set_the_exit_status(monkeypatch, server, wiki, capsys):
+    assert _main(monkeypatch, server, '--info', 'start', 'missing') == 1
+    out, err = capsys.readouterr()
+    assert '==> start <==' in out
+    assert err.startswith('missing: ')
+
+
+class _Input(object):
+    """Standard input recording the output written before each line."""
+
+    def __init__(self, lines, capsys):
+        self._lines = list(lines)
+        self._capsys = capsys
+        self.output = ''
+        self.seen = []
+
+    def readline(self):
+        self.output += self._capsys.readouterr().out
+        self.seen.append(self.output)
+        return self._lines.pop(0) if self._lines else ''
+
+
+def test_stdin_is_read_lazily(monkeypatch, server, wiki, capsys):
+    wiki.pages['start'] = 'first'
+    wiki.pages['ns1:page1'] = 'second'
+    stdin = _Input(['ns1:page1\n'], capsys)
+    monkeypatch.setattr(sys, 'stdin', stdin)
+    assert _main(monkeypatch, server, '--stdin', '--workers', '1',
+                 '--chunk-size', '1', '--raw', 'start') == 0
+    output = stdin.output + capsys.readouterr().out
+    assert output == '==> start <==\nfirst\n==> ns1:page1 <==\nsecond\n'
+    # The pages were output while the input was read.
+    assert stdin.seen[0] == '==> start <==\nfirst\n'
+    assert stdin.seen[1] == output
+
+
+def test_stdin_jsonl(monkeypatch, server, wiki, capsys):
+    monkeypatch.setattr(sys, 'stdin', io.StringIO(u'start\nns1:page1\n'))
+    assert _main(monkeypatch, server, '--stdin', '--jsonl', '--info') == 0
+    records = [json.loads(line)
+               for line in capsys.readouterr().out.splitlines()]
+    assert [record['id'] for record in records] == ['start', 'ns1:page1']
+    assert records[0]['result']['name'] == 'start'
@@ -0,0 +1,33 @@
+# -*- coding: UTF-8 -*-
+
+"""Tests of ProcessCrawler."""
+
+import os
+
+import pytest
+
+import benchmark
+import dokuwikixmlrpc
+
+pytestmark = pytest.mark.skipif(benchmark._fork_context() is None,
+                                reason='needs fork')
+
+
+def test_crawl(wiki, server, tmpdir):
+    url = 'http://%s:%d' % server.server_address
+    path = str(tmpdir)
+    wiki.pages['gone'] = ''
+    stale = os.path.join(path, 'pages', 'gone.txt')
+    os.makedirs(os.path.dirname(stale))
+    with open(stale, 'w') as old:
+        old.write('deleted since the last crawl\n')
+    crawler = dokuwikixmlrpc.ProcessCrawler(url, 'user', 'passwd', path,
+                                            processes=2, chunk_size=4)
+    result = crawler.crawl()
+    assert result == {'pages': len(wiki.pages) - 1, 'media': 1,
+                      'deleted': ['gone'], 'errors': {}}
+    assert not os.path.exists(stale)
+    with open(os.path.join(path, 'pages', 'start.txt')) as page:
+        assert page.read() == wiki.pages['start']
+    with open(os.path.join(path, 'media', 'media', 'file.bin'), 'rb') as f:
+        assert f.read() == wiki.files['media:file.bin']
@@ -0,0 +1,87 @@
+# -*- coding: UTF-8 -*-
+
+"""Tests of the streaming file transfers."""
+
+import base64
+import io
+import time
+
+import pytest
+
+import benchmark
+import dokuwikixmlrpc
+from dokuwikixmlrpc import xmlrpclib
+
+
+def _response(data):
+    return io.BytesIO(xmlrpclib.dumps((xmlrpclib.Binary(data),),
+                                      methodresponse=True).encode('utf-8'))
+
+
+@pytest.mark.parametrize('size', [0, 1, 2, 3, 65535, 65536, 200001])
+def test_base64_writer_decodes_into_file(size):
+    data = bytes(bytearray(i % 251 for i in range(size)))
+    out = io.BytesIO()
+    writer = dokuwikixmlrpc._Base64Writer(out)
+    assert writer.feed(_response(data), chunk_size=1000) == size
+    assert out.getvalue() == data
+
+
+def test_base64_writer_decodes_into_buffer():
+    data = b'0123456789' * 1000
+    buf = bytearray(len(data))
+    dokuwikixmlrpc._Base64Writer(buf).feed(_response(data), chunk_size=7)
+    assert bytes(buf) == data
+
+
+def test_base64_writer_reports_faults():
+    body = xmlrpclib.dumps(xmlrpclib.Fault(221, 'No such file'))
+    writer = dokuwikixmlrpc._Base64Writer(io.BytesIO())
+    with pytest.raises(xmlrpclib.Fault):
+        writer.feed(io.BytesIO(body.encode('utf-8')))
+
+
+def test_base64_writer_rejects_other_values():
+    body = xmlrpclib.dumps(('text',), methodresponse=True)
+    writer = dokuwikixmlrpc._Base64Writer(io.BytesIO())
+    with pytest.raises(dokuwikixmlrpc.DokuWikiError):
+        writer.feed(io.BytesIO(body.encode('utf-8')))
+
+
+@pytest.mark.parametrize('size', [0, 1, 5, 3 * 16384, 3 * 16384 + 1])
+def test_iter_base64_concatenates(size):
+    data = bytes(bytearray(i % 256 for i in range(size)))
+    expected = base64.b64encode(data)
+    assert b''.join(dokuwikixmlrpc._iter_base64(io.BytesIO(data),
+                                                size)) == expected
+    assert b''.join(dokuwikixmlrpc._iter_base64(data, size)) == expected
+
+
+def test_iter_base64_short_source():
+    with pytest.raises(dokuwikixmlrpc.DokuWikiError):
+        list(dokuwikixmlrpc._iter_base64(io.BytesIO(b'abc'), 10))
+
+
+def test_download_and_upload(wiki, client):
+    out = io.BytesIO()
+    assert client.download_file('media:file.bin', out) == 300000
+    assert out.getvalue() == wiki.files['media:file.bin']
+    data = b'uploaded' * 10000
+    client.upload_file('media:up.bin', io.BytesIO(data))
+    assert wiki.files['media:up.bin'] == data
+    with pytest.raises(dokuwikixmlrpc.DokuWikiXMLRPCError):
+        client.download_file('media:missing.bin', io.BytesIO())
+
+
+def test_streams_survive_stale_connections(wiki, client, monkeypatch):
+    # The server closes idle keep-alive connections before the pool does.
+    monkeypatch.setattr(benchmark._RequestHandler, 'timeout', 0.2)
+    data = b'x' * 100000
+    for _ in range(2):
+        out = io.BytesIO()
+        client.download_file('media:file.bin', out)
+        assert out.getvalue() == wiki.files['media:file.bin']
+        time.sleep(0.5)
+        client.upload_file('media:up.bin', io.BytesIO(data))
+        assert wiki.files['media:up.bin'] == data
+        time.sleep(0.5)
@@ -0,0 +1,55 @@
+# -*- coding: UTF-8 -*-
+
+"""Tests of the gzip compressed responses."""
+
+import gzip
+import io
+
+import pytest
+
+import dokuwikixmlrpc
+
+DATA = b''.join(b'<value><string>item %d</string></value>\n' % i
+                for i in range(20000))
+
+
+def _gzip(data):
+    out = io.BytesIO()
+    with gzip.GzipFile(fileobj=out, mode='wb') as compressed:
+        compressed.write(data)
+    return out.getvalue()
+
+
+@pytest.mark.parametrize('amt', [1, 100, 4096, 65536, 1 << 20])
+def test_read_chunks(amt):
+    response = dokuwikixmlrpc._GzipDecodedResponse(io.BytesIO(_gzip(DATA)))
+    chunks = []
+    while True:
+        chunk = response.read(amt)
+        if not chunk:
+            break
+        assert len(chunk) <= amt
+        chunks.append(chunk)
+    assert b''.join(chunks) == DATA
+
+
+def test_read_all():
+    response = dokuwikixmlrpc._GzipDecodedResponse(io.BytesIO(_gzip(DATA)))
+    assert response.read(10) == DATA[:10]
+    assert response.read() == DATA[10:]
+    assert response.read() == b''
+
+
+@pytest.mark.parametrize('accept_gzip', [True, False])
+def test_accept_gzip(server, wiki, accept_gzip):
+    sizes = []
+    client = dokuwikixmlrpc.DokuWikiClient(
+        'http://%s:%d' % server.server_address, 'user', 'passwd',
+        accept_gzip=accept_gzip)
+    client._transport.add_hook(post=lambda event: sizes.append(
+        event['response_bytes']))
+    wiki.pages['big'] = 'lorem ipsum ' * 10000
+    assert client.page('big') == wiki.pages['big']
+    client.close()
+    # The server compresses responses if the client accepts it.
+    assert (sizes[-1] < 10000) == accept_gzip
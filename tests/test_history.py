@@ -0,0 +1,142 @@
+# -*- coding: UTF-8 -*-
+
+"""Tests of PageHistory and its line deltas."""
+
+import random
+
+import pytest
+
+import benchmark
+import dokuwikixmlrpc
+from dokuwikixmlrpc import xmlrpclib
+
+
+class HistoryWiki(benchmark.FakeWiki):
+    """Fake Wiki listing the revisions of a page three at a time."""
+
+    def __init__(self):
+        benchmark.FakeWiki.__init__(self, pages=0)
+        self.pages.clear()
+        self.history = {}
+        self.changes = []
+        self.broken = set()
+
+    def edit(self, page_id, revision, text):
+        self.history.setdefault(page_id, {})[revision] = text
+        current = max(self.history[page_id])
+        self.pages[page_id] = self.history[page_id][current]
+        self.changes.append({'name': page_id, 'version': revision,
+                             'lastModified': xmlrpclib.DateTime(revision)})
+
+    def wiki_getPageInfo(self, page_id):
+        info = benchmark.FakeWiki.wiki_getPageInfo(self, page_id)
+        info['version'] = max(self.history[page_id])
+        return info
+
+    def wiki_getPageVersions(self, page_id, offset):
+        # DokuWiki starts over for an offset past the end.
+        revisions = sorted(self.history.get(page_id, {}), reverse=True)
+        return [{'version': revision, 'user': 'bench'}
+                for revision in (revisions[offset:] or revisions)[:3]]
+
+    def wiki_getPageVersion(self, page_id, revision):
+        if revision in self.broken:
+            raise xmlrpclib.Fault(1, 'Broken revision')
+        return self.history[page_id][revision]
+
+    def wiki_getRecentChanges(self, timestamp):
+        changes = [change for change in self.changes
+                   if change['version'] >= timestamp]
+        if not changes:
+            raise xmlrpclib.Fault(321, 'There are no changes')
+        return changes
+
+
+def _text(rng, lines):
+    return ''.join('line %d\n' % rng.randrange(8) for _ in range(lines))
+
+
+@pytest.fixture
+def wiki():
+    wiki = HistoryWiki()
+    rng = random.Random(1)
+    for revision in range(1, 8):
+        wiki.edit('start', revision * 10, _text(rng, 20))
+    wiki.edit('other', 10, 'only\n')
+    return wiki
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_delta_round_trip(seed):
+    rng = random.Random(seed)
+    newer = _text(rng, rng.randrange(30)).splitlines(True)
+    older = _text(rng, rng.randrange(30)).splitlines(True)
+    delta = dokuwikixmlrpc._reverse_delta(newer, older)
+    assert dokuwikixmlrpc._apply_delta(newer, delta) == older
+    assert dokuwikixmlrpc._reverse_delta(newer, newer) == ()
+
+
+def test_fetch_follows_pagination(wiki, client):
+    history = dokuwikixmlrpc.PageHistory(client, chunk_size=2)
+    history.fetch(['start', 'other'])
+    assert history.errors == {}
+    assert history.pages() == ['other', 'start']
+    assert history.revisions('start') == [70, 60, 50, 40, 30, 20, 10]
+    for revision, text in wiki.history['start'].items():
+        assert history.text('start', revision) == text
+    assert history.text('start') == wiki.pages['start']
+    assert history.text('other') == 'only\n'
+    assert history.timestamp == 70
+    with pytest.raises(KeyError):
+        history.text('start', 15)
+
+
+def test_update_with_newer_revisions(wiki, client):
+    history = dokuwikixmlrpc.PageHistory(client)
+    history.fetch(['start', 'other'])
+    old_deltas = history._pages['start']['deltas']
+    wiki.edit('start', 80, 'line 1\nnew\n')
+    wiki.edit('start', 90, 'newest\n')
+    wiki.edit('unknown', 90, 'not stored\n')
+    history.update()
+    assert history.pages() == ['other', 'start']
+    assert history.revisions('start')[:3] == [90, 80, 70]
+    # The deltas of the revisions stored before are kept as they are.
+    assert history._pages['start']['deltas'][2:] == old_deltas
+    for revision, text in wiki.history['start'].items():
+        assert history.text('start', revision) == text
+
+
+def test_update_with_older_revisions(wiki, client):
+    history = dokuwikixmlrpc.PageHistory(client)
+    history.fetch(['start'])
+    # A revision appearing between the stored ones, e.g. after an import.
+    wiki.edit('start', 25, 'restored\n')
+    history.fetch(['start'])
+    assert history.revisions('start') == [70, 60, 50, 40, 30, 25, 20, 10]
+    for revision, text in wiki.history['start'].items():
+        assert history.text('start', revision) == text
+
+
+def test_diff(wiki, client):
+    wiki.edit('page', 10, 'a\nb\nc\n')
+    wiki.edit('page', 20, 'a\nB\nc\n')
+    history = dokuwikixmlrpc.PageHistory(client)
+    history.fetch(['page'])
+    assert history.diff('page', 10) == (
+        '--- page@10\n+++ page@20\n@@ -1,3 +1,3 @@\n'
+        ' a\n-b\n+B\n c\n')
+    assert history.diff('page', 20, 10, context=0) == (
+        '--- page@20\n+++ page@10\n@@ -2 +2 @@\n-B\n+b\n')
+
+
+def test_fetch_errors(wiki, client):
+    history = dokuwikixmlrpc.PageHistory(client)
+    wiki.broken.add(30)
+    history.fetch(['start'])
+    assert isinstance(history.errors['start'], dokuwikixmlrpc.DokuWikiError)
+    assert 30 not in history.revisions('start')
+    wiki.broken.clear()
+    history.fetch(['start'])
+    assert history.errors == {}
+    assert history.text('start', 30) == wiki.history['start'][30]
@@ -0,0 +1,49 @@
+# -*- coding: UTF-8 -*-
+
+"""Tests of LinkGraph."""
+
+import dokuwikixmlrpc
+
+
+def _graph(wiki, client):
+    wiki.pages = {'a': '[[b]] [[missing]] [[b#section]]', 'b': '[[a]]',
+                  'c': 'no links', 'd': '[[d]]'}
+    graph = dokuwikixmlrpc.LinkGraph(client, chunk_size=2)
+    graph.build()
+    return graph
+
+
+def test_build(wiki, client):
+    graph = _graph(wiki, client)
+    assert graph.errors == {}
+    assert sorted(graph.pages()) == ['a', 'b', 'c', 'd']
+    assert sorted(graph.links('a')) == ['b', 'missing']
+    assert graph.links('unknown') == []
+    assert graph.backlinks('a') == ['b']
+    assert graph.backlinks('missing') == ['a']
+    assert sorted(graph.orphans()) == ['c', 'd']
+    assert graph.broken_links() == {'a': ['missing']}
+    rank = graph.pagerank()
+    assert sorted(rank) == ['a', 'b', 'c', 'd']
+    assert abs(sum(rank.values()) - 1) < 1e-9
+    assert rank['a'] > rank['c'] and rank['b'] > rank['c']
+
+
+def test_update(wiki, client):
+    graph = _graph(wiki, client)
+    client.put_page('c', '[[a]] [[new]]')
+    client.put_page('new', 'created')
+    client.put_page('b', '')
+    graph.update()
+    assert sorted(graph.pages()) == ['a', 'c', 'd', 'new']
+    assert graph.backlinks('a') == ['c']
+    assert graph.backlinks('new') == ['c']
+    broken = graph.broken_links()
+    assert list(broken) == ['a']
+    assert sorted(broken['a']) == ['b', 'missing']
+    assert sorted(graph.orphans()) == ['c', 'd']
+    # Nothing changed since.
+    timestamp = graph.timestamp
+    graph.update()
+    assert graph.timestamp == timestamp
+    assert sorted(graph.pages()) == ['a', 'c', 'd', 'new']
@@ -0,0 +1,85 @@
+# -*- coding: UTF-8 -*-
+
+"""Tests of the streaming parser of array responses."""
+
+import time
+
+import pytest
+
+import benchmark
+import dokuwikixmlrpc
+from dokuwikixmlrpc import xmlrpclib
+
+
+def _parse(result, chunk_size=None, convert=None):
+    body = xmlrpclib.dumps((result,), methodresponse=True,
+                           allow_none=True).encode('utf-8')
+    parser = dokuwikixmlrpc._ListParser(convert)
+    items = []
+    step = chunk_size or len(body)
+    for offset in range(0, len(body), step):
+        parser.feed(body[offset:offset + step])
+        items.extend(parser.items)
+        parser.items.clear()
+    parser.feed(b'')
+    return items + list(parser.items)
+
+
+NESTED = [
+    {'id': 'start', 'size': 12, 'hash': 'abc', 'perms': 8,
+     'tags': ['a', ['b', {'c': 1}]], 'nested': {'list': [1, 2], 'd': {}}},
+    [], [[1], {'x': []}], 'text', 1.5, True, False, None,
+    xmlrpclib.DateTime('20240102T03:04:05'),
+]
+
+
+@pytest.mark.parametrize('chunk_size', [None, 1, 7, 64])
+def test_nested_values(chunk_size):
+    assert _parse(NESTED, chunk_size) == NESTED
+
+
+def test_binary_and_empty_values():
+    items = _parse([xmlrpclib.Binary(b'\x00\x01'), '', {}])
+    assert items[0].data == b'\x00\x01'
+    assert items[1:] == ['', {}]
+
+
+def test_convert():
+    items = _parse([{'id': 'a', 'rev': 1}],
+                   convert=dokuwikixmlrpc._record(dokuwikixmlrpc.PageEntry))
+    assert items == [dokuwikixmlrpc.PageEntry('a', 1, None, None, None, None,
+                                              None)]
+
+
+@pytest.mark.parametrize('chunk_size', [None, 1])
+def test_fault(chunk_size):
+    body = xmlrpclib.dumps(xmlrpclib.Fault(321, 'No changes')).encode('utf-8')
+    parser = dokuwikixmlrpc._ListParser()
+    step = chunk_size or len(body)
+    for offset in range(0, len(body), step):
+        parser.feed(body[offset:offset + step])
+    assert not parser.items
+    with pytest.raises(xmlrpclib.Fault) as info:
+        parser.feed(b'')
+    assert info.value.faultCode == 321
+    assert info.value.faultString == 'No changes'
+
+
+def test_iter_all_pages(wiki, client):
+    pages = list(client.iter_all_pages(records=True))
+    assert sorted(page.id for page in pages) == sorted(wiki.pages)
+    assert (sorted(page['id'] for page in client.iter_pagelist('ns1:')) ==
+            sorted(page_id for page_id in wiki.pages
+                   if page_id.startswith('ns1:')))
+
+
+def test_iter_list_fault(client):
+    with pytest.raises(dokuwikixmlrpc.DokuWikiXMLRPCError):
+        list(client._iter_list('wiki.getPageInfo', ('missing',)))
+
+
+def test_iter_list_survives_stale_connections(wiki, client, monkeypatch):
+    monkeypatch.setattr(benchmark._RequestHandler, 'timeout', 0.2)
+    for _ in range(2):
+        assert len(list(client.iter_all_pages())) == len(wiki.pages)
+        time.sleep(0.5)
@@ -0,0 +1,82 @@
+# -*- coding: UTF-8 -*-
+
+"""Tests of DokuWikiMirror."""
+
+import os
+
+import pytest
+
+import dokuwikixmlrpc
+
+
+@pytest.fixture
+def mirror(client, tmpdir):
+    return dokuwikixmlrpc.DokuWikiMirror(client, str(tmpdir), workers=2)
+
+
+def _files(path):
+    return sorted(os.path.relpath(os.path.join(directory, name), path)
+                  for directory, _, names in os.walk(path) for name in names)
+
+
+def test_full_sync(wiki, mirror, tmpdir):
+    result = mirror.sync()
+    assert result['errors'] == {}
+    assert sorted(result['pages']) == sorted(wiki.pages)
+    assert result['media'] == ['media:file.bin']
+    assert sorted(mirror.page_ids()) == sorted(wiki.pages)
+    assert mirror.read_page('ns1:page1') == wiki.pages['ns1:page1']
+    with open(mirror.media_path('media:file.bin'), 'rb') as media:
+        assert media.read() == wiki.files['media:file.bin']
+    assert not [name for name in _files(str(tmpdir))
+                if name.endswith('.tmp')]
+    # Nothing changed, nothing is fetched again.
+    assert mirror.sync(full=True) == {'pages': [], 'media': [],
+                                      'deleted': [], 'errors': {}}
+
+
+def test_incremental_sync(wiki, client, mirror):
+    mirror.sync()
+    timestamp = mirror.timestamp
+    client.put_page('ns1:page1', 'changed')
+    client.put_page('new:page', 'new')
+    client.put_file('media:other.bin', b'\0\1\2')
+    result = mirror.sync()
+    assert result == {'pages': ['new:page', 'ns1:page1'],
+                      'media': ['media:other.bin'], 'deleted': [],
+                      'errors': {}}
+    assert mirror.timestamp > timestamp
+    assert mirror.read_page('ns1:page1') == 'changed'
+    with open(mirror.media_path('media:other.bin'), 'rb') as media:
+        assert media.read() == b'\0\1\2'
+
+
+def test_deletions(wiki, client, mirror):
+    mirror.sync()
+    client.put_page('ns1:page1', '')
+    client.delete_file('media:file.bin')
+    result = mirror.sync()
+    assert sorted(result['deleted']) == ['media:file.bin', 'ns1:page1']
+    assert 'ns1:page1' not in mirror.page_ids()
+    assert not os.path.exists(mirror.page_path('ns1:page1'))
+    assert not os.path.exists(mirror.media_path('media:file.bin'))
+
+
+def test_connection_errors(wiki, client, mirror, monkeypatch):
+    def fail(file_id, fileobj):
+        fileobj.write(b'partial')
+        raise dokuwikixmlrpc.DokuWikiConnectionError(IOError('timed out'))
+
+    monkeypatch.setattr(client, 'download_file', fail)
+    result = mirror.sync()
+    assert list(result['errors']) == ['media:file.bin']
+    assert sorted(result['pages']) == sorted(wiki.pages)
+    assert not os.path.exists(mirror.media_path('media:file.bin') + '.tmp')
+    # The fetched pages were recorded, the media file is fetched again.
+    assert mirror.timestamp == 0
+    monkeypatch.undo()
+    mirror = dokuwikixmlrpc.DokuWikiMirror(client, mirror._path)
+    result = mirror.sync()
+    assert result['pages'] == []
+    assert result['media'] == ['media:file.bin']
+    assert result['errors'] == {}
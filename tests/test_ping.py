@@ -0,0 +1,64 @@
+# -*- coding: UTF-8 -*-
+
+"""Tests of lazy clients and ping()."""
+
+import socket
+
+import pytest
+
+import dokuwikixmlrpc
+
+
+@pytest.fixture(autouse=True)
+def ping_cache(monkeypatch):
+    cache = {}
+    monkeypatch.setattr(dokuwikixmlrpc, '_PING_CACHE', cache)
+    return cache
+
+
+def _unused_url():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    url = 'http://%s:%d' % sock.getsockname()
+    sock.close()
+    return url
+
+
+def _client(url, lazy=True):
+    client = dokuwikixmlrpc.DokuWikiClient(url, 'user', 'passwd', lazy=lazy)
+    methods = []
+    client.add_request_hook(post=lambda event: methods.append(
+        event['method']))
+    return client, methods
+
+
+def test_lazy_client_pings_once(server, ping_cache):
+    url = 'http://%s:%d' % server.server_address
+    client, methods = _client(url)
+    assert methods == []
+    client.page('start')
+    client.page('start')
+    assert methods == ['wiki.getRPCVersionSupported', 'wiki.getPage',
+                       'wiki.getPage']
+    assert ping_cache == {url: 2}
+    # Further clients of the Wiki use the cached result.
+    other, methods = _client(url)
+    assert other.ping() == 2
+    other.page('start')
+    assert methods == ['wiki.getPage']
+    client.close()
+    other.close()
+
+
+def test_unreachable_lazy_client():
+    client, methods = _client(_unused_url())
+    with pytest.raises(dokuwikixmlrpc.DokuWikiURLError):
+        client.page('start')
+    with pytest.raises(dokuwikixmlrpc.DokuWikiURLError):
+        client.ping()
+    client.close()
+
+
+def test_unreachable_client():
+    with pytest.raises(dokuwikixmlrpc.DokuWikiURLError):
+        dokuwikixmlrpc.DokuWikiClient(_unused_url(), 'user', 'passwd')
@@ -0,0 +1,66 @@
+# -*- coding: UTF-8 -*-
+
+"""Tests of the retry policy."""
+
+import io
+
+import pytest
+
+import benchmark
+import dokuwikixmlrpc
+
+
+@pytest.fixture
+def unavailable(monkeypatch):
+    """Answer the next failures[0] POST requests with HTTP status 503."""
+    failures = [0]
+    do_post = benchmark._RequestHandler.do_POST
+
+    def flaky_post(handler):
+        if failures[0] > 0:
+            failures[0] -= 1
+            handler.rfile.read(int(handler.headers['Content-Length']))
+            handler.send_response(503)
+            handler.send_header('Content-Length', '0')
+            handler.end_headers()
+            return
+        do_post(handler)
+    monkeypatch.setattr(benchmark._RequestHandler, 'do_POST', flaky_post)
+    return failures
+
+
+@pytest.fixture
+def retrying(server):
+    retry = dokuwikixmlrpc.RetryPolicy(max_retries=2, backoff=0.01)
+    client = dokuwikixmlrpc.DokuWikiClient(
+        'http://%s:%d' % server.server_address, 'user', 'passwd',
+        retry=retry)
+    yield client
+    client.close()
+
+
+def test_calls_are_retried(wiki, retrying, unavailable):
+    unavailable[0] = 2
+    assert retrying.page('start') == wiki.pages['start']
+    assert retrying.stats()['wiki.getPage']['retries'] == 2
+
+
+def test_streams_are_retried(wiki, retrying, unavailable):
+    unavailable[0] = 2
+    out = io.BytesIO()
+    retrying.download_file('media:file.bin', out)
+    assert out.getvalue() == wiki.files['media:file.bin']
+    unavailable[0] = 2
+    assert len(list(retrying.iter_all_pages())) == len(wiki.pages)
+
+
+def test_streamed_writes_are_not_retried(retrying, unavailable):
+    unavailable[0] = 1
+    with pytest.raises(dokuwikixmlrpc.DokuWikiXMLRPCProtocolError):
+        retrying.upload_file('media:up.bin', io.BytesIO(b'data'))
+
+
+def test_retries_are_limited(retrying, unavailable):
+    unavailable[0] = 3
+    with pytest.raises(dokuwikixmlrpc.DokuWikiXMLRPCProtocolError):
+        list(retrying.iter_all_pages())
@@ -0,0 +1,27 @@
+# -*- coding: UTF-8 -*-
+
+"""Tests of the query parsing of SearchIndex."""
+
+import dokuwikixmlrpc
+
+
+def _index(client):
+    index = dokuwikixmlrpc.SearchIndex(client, schemas=['project'])
+    index._add('a', 'text', 'see the wiki:syntax page')
+    index._add('a', 'project.status', 'open')
+    index._add('b', 'text', 'the wiki has syntax highlighting')
+    index._add('b', 'project.status', 'closed')
+    return index
+
+
+def test_field_prefix(client):
+    index = _index(client)
+    assert [page for page, _ in index.search('project.status:open')] == ['a']
+    assert [page for page, _ in index.search('text:syntax')] == ['a', 'b']
+    assert index.search('project.owner:open') == []
+
+
+def test_unknown_prefix_is_part_of_the_words(client):
+    index = _index(client)
+    assert [page for page, _ in index.search('wiki:syntax')] == ['a']
+    assert [page for page, _ in index.search('wiki:"has syntax"')] == ['b']
@@ -0,0 +1,68 @@
+# -*- coding: UTF-8 -*-
+
+"""Tests of the request statistics and hooks."""
+
+import pytest
+
+import benchmark
+import dokuwikixmlrpc
+
+
+def test_calls_and_bytes(wiki, client):
+    client._transport.stats.reset()
+    assert client.stats() == {}
+    for _ in range(3):
+        client.page('start')
+    stats = client.stats()
+    assert list(stats) == ['wiki.getPage']
+    stats = stats['wiki.getPage']
+    assert stats['calls'] == 3
+    assert (stats['faults'], stats['errors'], stats['retries']) == (0, 0, 0)
+    assert stats['request_bytes'] > 0
+    # Every response holds the page.
+    assert stats['response_bytes'] > 3 * len(wiki.pages['start'])
+    assert stats['time'] > 0
+    bounds = [bound for bound, _ in stats['histogram']]
+    assert bounds == list(dokuwikixmlrpc.DokuWikiStats.BUCKETS)
+    assert sum(count for _, count in stats['histogram']) == 3
+
+
+def test_faults_and_errors(client, monkeypatch):
+    with pytest.raises(dokuwikixmlrpc.DokuWikiError):
+        client.page_info('missing')
+    assert client.stats()['wiki.getPageInfo']['faults'] == 1
+
+    def not_found(handler):
+        handler.rfile.read(int(handler.headers['Content-Length']))
+        handler.send_response(404)
+        handler.send_header('Content-Length', '0')
+        handler.end_headers()
+    monkeypatch.setattr(benchmark._RequestHandler, 'do_POST', not_found)
+    with pytest.raises(dokuwikixmlrpc.DokuWikiError):
+        client.page_info('start')
+    stats = client.stats()['wiki.getPageInfo']
+    assert (stats['calls'], stats['faults'], stats['errors']) == (2, 1, 1)
+    assert sum(count for _, count in stats['histogram']) == 2
+
+
+def test_hooks(client):
+    pre = []
+    post = []
+    client.add_request_hook(pre=lambda event: pre.append(dict(event)),
+                            post=post.append)
+    client.page('start')
+    with pytest.raises(dokuwikixmlrpc.DokuWikiError):
+        client.page_info('missing')
+    assert [event['method'] for event in pre] == \
+        ['wiki.getPage', 'wiki.getPageInfo']
+    assert sorted(pre[0]) == ['method', 'request_bytes']
+    assert [event['method'] for event in post] == \
+        ['wiki.getPage', 'wiki.getPageInfo']
+    assert post[0]['error'] is None
+    assert post[0]['request_bytes'] == pre[0]['request_bytes']
+    assert post[0]['response_bytes'] > 0
+    assert post[0]['elapsed'] >= 0
+    assert isinstance(post[1]['error'], dokuwikixmlrpc.xmlrpclib.Fault)
+    # The events are the ones recorded in the statistics.
+    assert client.stats()['wiki.getPage']['response_bytes'] == \
+        post[0]['response_bytes']
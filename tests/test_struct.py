@@ -0,0 +1,72 @@
+# -*- coding: UTF-8 -*-
+
+"""Tests of the struct data export."""
+
+import io
+import json
+
+import pytest
+
+import benchmark
+import dokuwikixmlrpc
+
+COLUMNS = ['title', 'tags']
+ROWS = {'ns:a': {'title': 'A', 'tags': ['x', 'y']},
+        'ns:b': {'title': 'B', 'tags': []}}
+
+
+class StructWiki(benchmark.FakeWiki):
+    """Fake Wiki with struct data, answering aggregations with keys."""
+
+    keys = 'qualified'
+
+    def plugin_struct_getSchema(self, schema):
+        return {schema: [{'name': column} for column in COLUMNS]}
+
+    def plugin_struct_getAggregationData(self, schemas, columns, logic,
+                                         column):
+        assert columns == ['%pageid%', 'book.title', 'book.tags']
+        rows = []
+        for page_id, row in sorted(ROWS.items()):
+            # Reverse the key order to catch positional mapping.
+            data = [('%pageid%', page_id)]
+            for name in COLUMNS:
+                key = 'book.' + name if self.keys == 'qualified' else name
+                data.append((key, row[name]))
+            rows.append(dict(reversed(data)))
+        if self.keys == 'unknown':
+            rows[0]['other'] = 1
+        return rows
+
+    def plugin_struct_getData(self, page_id, schema, timestamp):
+        if page_id not in ROWS:
+            return {}
+        return {schema: ROWS[page_id]}
+
+
+@pytest.fixture
+def wiki():
+    return StructWiki(pages=2)
+
+
+@pytest.mark.parametrize('keys', ['qualified', 'bare'])
+def test_aggregation_columns(wiki, client, keys):
+    wiki.keys = keys
+    assert client.struct_export('book') == {
+        'pid': ['ns:a', 'ns:b'], 'title': ['A', 'B'],
+        'tags': [['x', 'y'], []]}
+
+
+def test_unknown_columns(wiki, client):
+    wiki.keys = 'unknown'
+    with pytest.raises(dokuwikixmlrpc.DokuWikiError):
+        client.struct_export('book')
+
+
+def test_pages_export(client):
+    out = io.StringIO()
+    assert client.struct_export('book', ['ns:a', 'missing', 'ns:b'], out,
+                                fmt='jsonl') == 2
+    rows = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert rows == [{'pid': 'ns:a', 'title': 'A', 'tags': ['x', 'y']},
+                    {'pid': 'ns:b', 'title': 'B', 'tags': []}]
@@ -0,0 +1,89 @@
+# -*- coding: UTF-8 -*-
+
+"""Tests of the namespace walker."""
+
+import threading
+
+import pytest
+
+import dokuwikixmlrpc
+
+TREE = {
+    '': ['a', 'b', 'c', 'd', 'e'],
+    'a': ['a:x'],
+    'a:x': [],
+    'b': [],
+    'c': ['c:y'],
+    'c:y': [],
+    'd': [],
+    'e': [],
+}
+
+
+class _TreeClient(dokuwikixmlrpc.DokuWikiClient):
+    """Client listing TREE, where every namespace contains one page.
+
+    The listings of the namespaces of a cursor finish together, so several
+    namespaces are done in the same round of the walk.
+    """
+
+    def __init__(self):
+        self._gate = threading.Event()
+        self.listed = []
+
+    def _list_subtree(self, namespace, media):
+        self.listed.append(namespace)
+        if namespace.count(':') == 0 and namespace:
+            self._gate.wait(1)
+        self._gate.set()
+        return dict((ns, (TREE[ns], [{'id': (ns + ':' if ns else '') +
+                                      'page'}], []))
+                    for ns in TREE if ns == namespace or
+                    ns.startswith(namespace + ':') or not namespace)
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_resume_from_every_cursor(workers):
+    client = _TreeClient()
+    entries = list(client.walk(workers=workers))
+    assert sorted(entry.namespace for entry in entries) == sorted(TREE)
+    assert client.listed == ['']
+    for index, entry in enumerate(entries):
+        resumed_client = _TreeClient()
+        resumed = [resumed_entry.namespace for resumed_entry in
+                   resumed_client.walk(workers=workers, cursor=entry.cursor)]
+        visited = [seen.namespace for seen in entries[:index + 1]]
+        assert sorted(visited + resumed) == sorted(TREE)
+        assert sorted(resumed_client.listed) == sorted(entry.cursor)
+
+
+def test_namespaces_without_pages(wiki, client):
+    wiki.pages = {'start': 'text', 'deep:a:b:page': 'text'}
+    wiki.files = {'mediaonly:file.bin': b'data', 'deep:a:pic.png': b'data'}
+    entries = dict((entry.namespace, entry) for entry in client.walk())
+    assert sorted(entries) == ['', 'deep', 'deep:a', 'deep:a:b',
+                               'mediaonly']
+    assert entries['deep'].namespaces == ['deep:a']
+    assert [page['id'] for page in entries['deep:a:b'].pages] == [
+        'deep:a:b:page']
+    assert [item['id'] for item in entries['deep:a'].media] == [
+        'deep:a:pic.png']
+    assert [item['id'] for item in entries['mediaonly'].media] == [
+        'mediaonly:file.bin']
+    assert 'mediaonly' not in [entry.namespace
+                               for entry in client.walk(media=False)]
+
+
+def test_subtree_is_listed_once(wiki, client):
+    wiki.pages = dict(('a:b:c:d:page%d' % i, 'text') for i in range(5))
+    wiki.pages.update({'start': 'text', 'a:b:page': 'text',
+                       'x:page': 'text', 'x:y:page': 'text'})
+    methods = []
+    client._transport.add_hook(post=lambda event: methods.append(
+        event['method']))
+    entries = list(client.walk(exclude=['x:y']))
+    assert [entry.namespace for entry in entries] == [
+        '', 'a', 'media', 'x', 'a:b', 'a:b:c', 'a:b:c:d']
+    assert entries[3].namespaces == []
+    assert len(entries[-1].pages) == 5
+    assert sorted(methods) == ['dokuwiki.getPagelist', 'wiki.getAttachments']